@@ -1,29 +1,27 @@
 import streamlit as st
 import io
+import csv
 import re
 import zipfile
 import math
-import chardet
 import os
 import json
 import random
 import time
+import threading
 import streamlit.components.v1 as components
-from github import Github
-
-# NLP Imports
-import nltk
-from nltk.stem import WordNetLemmatizer
-from nltk.corpus import wordnet, stopwords
-from nltk import pos_tag
-from docx import Document
-
-# Optional Spacy
-try:
-    import spacy
-    _HAS_SPACY = True
-except ImportError:
-    _HAS_SPACY = False
+
+# 文档读取层 & 提取引擎
+from vocabmaster.ingest import iter_text_from_bytes
+from vocabmaster.engine import (extract_stats, batch_extract, effective_mode, LemmaStats, nltk_lemma, prepare_engine, warm_up,
+                                ensure_nltk_resources, load_nltk_corpora)
+from vocabmaster.publish import GithubPublisher
+from vocabmaster.library import LibraryCatalog
+from vocabmaster.search import SearchIndex
+from vocabmaster.wordlists import WordlistIndex, load_custom_wordlist
+from vocabmaster.cache import ResultCache, result_cache_key
+from vocabmaster.jobs import JobQueue, JobQueueFull, JOB_CPU_SHARE
+from vocabmaster import metrics
 
 # ------------------ 0. 初始化 & 资源加载 ------------------
 WORDLIST_DIR = "wordlists"
@@ -42,36 +40,60 @@ PRESET_WORDLISTS = {
     "👨‍🎓 高考3500词": os.path.join(WORDLIST_DIR, "gaokao.txt"),
 }
 
+# 选择引擎后在后台线程预热模型 (VOCAB_WARMUP=0 关闭)
+ENGINE_WARMUP = os.environ.get("VOCAB_WARMUP", "1") != "0"
+
+# 提取结果缓存
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", os.path.join(".cache", "results"))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 200 << 20))
+
+# 词书库倒排索引的持久化目录
+SEARCH_INDEX_DIR = os.environ.get("SEARCH_INDEX_DIR", os.path.join(".cache", "search_index"))
+# 公共词书库每页显示的书本数
+LIBRARY_PAGE_SIZE = int(os.environ.get("LIBRARY_PAGE_SIZE", 12))
+# 引擎选项 (第一个为默认)：词性感知的 NLTK 质量接近 spaCy，开销小得多
+ENGINE_OPTIONS = {"nltk+词性 (推荐)": "nltk-pos", "nltk (最快)": "nltk", "spacy (精准)": "spacy"}
+
 @st.cache_resource
-def download_nltk_resources():
-    resources = ["punkt", "averaged_perceptron_tagger", "averaged_perceptron_tagger_eng", "wordnet", "omw-1.4", "stopwords"]
-    for r in resources:
-        try: nltk.data.find(f'tokenizers/{r}')
-        except LookupError: nltk.download(r, quiet=True)
-        except ValueError: nltk.download(r, quiet=True)
+def get_wordlist_index():
+    return WordlistIndex(PRESET_WORDLISTS.values())
 
 @st.cache_resource
-def load_spacy_model():
-    if _HAS_SPACY:
-        try:
-            # 优先尝试加载高精度 Transformer 模型 (更厉害!)
-            # 注意: 需要先在终端运行: python -m spacy download en_core_web_trf
-            return spacy.load("en_core_web_trf")
-        except OSError:
-            try:
-                # 降级方案: 中等模型
-                return spacy.load("en_core_web_md")
-            except OSError:
-                # 保底方案: 小模型
-                return spacy.load("en_core_web_sm", disable=["ner", "parser"])
-        except Exception:
-            return None
-    return None
-download_nltk_resources()
-nlp_spacy = load_spacy_model()
+def _get_publisher(token, repo_name):
+    return GithubPublisher(token, repo_name)
+
+@st.cache_resource
+def get_library_lock():
+    return threading.Lock()
+
+@st.cache_resource
+def get_library_catalog():
+    return LibraryCatalog(LIBRARY_DIR)
+
+@st.cache_resource
+def get_search_index():
+    index = SearchIndex(SEARCH_INDEX_DIR)
+    index.sync(get_library_catalog())
+    return index
+
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES)
+
+@st.cache_resource
+def get_job_queue():
+    """进程内所有会话共享的提取任务队列 (全局并发上限)"""
+    return JobQueue()
+
+@st.cache_resource
+def get_metrics_server():
+    """设置 VOCAB_METRICS_PORT 时，每个 Streamlit 进程启动一次 /metrics 端点"""
+    return metrics.start_metrics_server()
+
 
 # ------------------ 1. 深度 CSS 设计系统 ------------------
 st.set_page_config(page_title="VocabMaster", page_icon="⚡", layout="wide", initial_sidebar_state="expanded")
+get_metrics_server()
 
 st.markdown("""
 <style>
@@ -157,124 +179,201 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ------------------ 2. 逻辑函数 ------------------
+def get_publisher():
+    """有 GitHub 配置时返回 (进程内共享的) 后台发布队列，否则返回 None"""
+    try:
+        if "GITHUB_TOKEN" not in st.secrets: return None
+        return _get_publisher(st.secrets["GITHUB_TOKEN"], f"{st.secrets['GITHUB_USERNAME']}/{st.secrets['GITHUB_REPO']}")
+    except Exception:
+        return None
+
 def save_to_github_library(filename, content, title, desc):
     try:
-        # 1. 优先尝试云端上传
-        if "GITHUB_TOKEN" in st.secrets:
-            token = st.secrets["GITHUB_TOKEN"]
-            g = Github(token)
-            repo = g.get_repo(f"{st.secrets['GITHUB_USERNAME']}/{st.secrets['GITHUB_REPO']}")
-            
-            # 上传文件
-            try: repo.create_file(f"library/{filename}", f"Create {filename}", content)
-            except: repo.update_file(f"library/{filename}", f"Update {filename}", content, repo.get_contents(f"library/{filename}").sha)
+        with metrics.request_trace("publish", file=filename):
+            _publish(filename, content, title, desc)
+    except Exception as e:
+        st.error(f"发布过程中出现错误: {e}")
 
-            # 更新云端 info.json
-            info_path = "library/info.json"
-            try:
-                c = repo.get_contents(info_path)
-                info = json.loads(c.decoded_content.decode())
-            except:
-                info = {}
-            
-            info[filename] = {"title": title, "desc": desc, "date": time.strftime("%Y-%m-%d")}
-            
-            try:
-                repo.update_file(info_path, "Update info", json.dumps(info, ensure_ascii=False, indent=2), repo.get_contents(info_path).sha)
-            except:
-                repo.create_file(info_path, "Init info", json.dumps(info, ensure_ascii=False, indent=2))
-                
-            st.toast("✅ 云端发布成功！", icon="🎉")
-        else:
-            st.toast("⚠️ 无 GitHub Token，仅保存到本地。", icon="📂")
+def _publish(filename, content, title, desc):
+    meta = {"title": title, "desc": desc, "date": time.strftime("%Y-%m-%d")}
 
-        # 2. 始终保存到本地 (用于即时显示)
+    # 1. 云端上传交给后台队列，立即返回 (词表与 info.json 在同一个 commit 中提交)
+    publisher = get_publisher()
+    if publisher:
+        with metrics.span("publish_submit"): publisher.submit(filename, content, meta)
+        st.toast("☁️ 已加入云端发布队列，可在侧边栏查看进度", icon="🚀")
+    else:
+        st.toast("⚠️ 无 GitHub Token，仅保存到本地。", icon="📂")
+
+    # 2. 始终保存到本地 (用于即时显示)，加锁避免并发发布互相覆盖 info.json
+    with metrics.span("library_write"), get_library_lock():
         with open(os.path.join(LIBRARY_DIR, filename), "w", encoding="utf-8") as f: f.write(content)
-        
-        # 更新本地 info.json
+
         local_info_path = os.path.join(LIBRARY_DIR, "info.json")
-        try: 
+        try:
             with open(local_info_path, "r", encoding="utf-8") as f: local_info = json.load(f)
         except: local_info = {}
-        
-        local_info[filename] = {"title": title, "desc": desc, "date": time.strftime("%Y-%m-%d")}
-        
-        with open(local_info_path, "w", encoding="utf-8") as f: json.dump(local_info, f, indent=2, ensure_ascii=False)
 
-        time.sleep(1)
-        st.rerun()
-
-    except Exception as e:
-        st.error(f"发布过程中出现错误: {e}")
-
-def extract_text_from_bytes(file_obj, filename):
+        local_info[filename] = meta
+
+        tmp_path = f"{local_info_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f: json.dump(local_info, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, local_info_path)
+    metrics.count("bytes_published_total", len(content.encode("utf-8")))
+    with metrics.span("library_reindex"):
+        get_library_catalog().refresh(force=True)
+        get_search_index().sync(get_library_catalog())
+
+class _ProgressReader:
+    """包装上传文件，记录已读取的原始字节数；只记账不回调 —— 读取发生在解码层的 try 里，
+    取消异常不能从这里抛出，由提取阶段的进度回调通过 take() 上报"""
+    def __init__(self, f):
+        self._f = f
+        self.name, self.size = f.name, f.size
+        self.read_bytes = self.reported = 0
+
+    def read(self, n=-1):
+        data = self._f.read(n)
+        if n is not None and n >= 0: self.read_bytes = min(self.read_bytes + len(data), self.size)
+        return data
+
+    def take(self, finished=False):
+        """自上次上报以来新读取的字节数；finished 时补齐到文件大小 (PDF / docx 是整份一次读入的)"""
+        if finished: self.read_bytes = self.size
+        n, self.reported = self.read_bytes - self.reported, self.read_bytes
+        return n
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+def _finish_after(pieces, reader, progress):
+    yield from pieces
+    progress(reader.take(finished=True))
+
+def iter_documents(input_text, uploaded_files, decode_log=None, english_only=False, pdf_workers=None, progress=None):
+    """依次产出 (文档名, 文本片段迭代器, 提取阶段的进度回调)：粘贴文本和每个上传文件各算一个文档；
+    decode_log 收集各文件的解码信息，pdf_workers 限制 PDF 并行抽取的进程数。
+    进度按输入大小计 (与任务 total 同单位)：粘贴文本按字符数，上传文件按已读取的原始字节数"""
+    if input_text: yield "粘贴文本", [input_text], progress
+    for f in uploaded_files or []:
+        info = {}
+        if decode_log is not None: decode_log.append(info)
+        if not progress:
+            yield f.name, iter_text_from_bytes(f, f.name, info=info, english_only=english_only, pdf_workers=pdf_workers), None
+            continue
+        reader = _ProgressReader(f)
+        pieces = iter_text_from_bytes(reader, f.name, info=info, english_only=english_only, pdf_workers=pdf_workers)
+        yield f.name, _finish_after(pieces, reader, progress), lambda n, reader=reader: progress(reader.take())
+
+def snapshot_files(uploaded_files):
+    """把上传文件复制成独立的 BytesIO (带 name / size)，后台任务不再依赖会话里的 UploadedFile"""
+    files = []
+    for f in uploaded_files or []:
+        buf = io.BytesIO(f.getvalue())
+        buf.name, buf.size = f.name, f.size
+        files.append(buf)
+    return files
+
+def run_extraction(job, req):
+    """后台任务 (在任务线程中运行，不调用 st.*)：加载引擎 → 查缓存 → 提取 → 写缓存。
+    只做与过滤设置无关的部分：以最短词长 1、不带屏蔽表提取完整的 lemma 统计 (顺序 / 词性)。
+    job.progress 兼作取消检查点"""
+    mode, files, input_text = req["mode"], req["files"], req["input_text"]
+    with metrics.request_trace("extract", engine=mode, batch=req["batch"], job=job.id):
+        try:
+            with metrics.span("engine_load", engine=mode): nlp = prepare_engine(mode)
+        except LookupError as e:
+            raise RuntimeError(f"离线模式下缺少 NLTK 资源，请预先下载: {e}")
+        metrics.count("bytes_in_total", len(input_text.encode("utf-8")) + sum(f.size for f in files))
+
+        mode = effective_mode(mode, nlp)
+        engine = f"spacy:{nlp.meta['name']}-{nlp.meta['version']}" if mode == "spacy" else mode
+        cache = req["cache"]
+        with metrics.span("cache_lookup"):
+            cache_key = result_cache_key(input_text, files, engine, req["english_only"])
+            cached = cache.get(cache_key)
+        if cached is not None and (not req["batch"] or "per_file" in cached):
+            per_file = [(n, LemmaStats.from_dict(d)) for n, d in cached.get("per_file", [])] if req["batch"] else []
+            return {"stats": LemmaStats.from_dict(cached["stats"]), "per_file": per_file, "decode_log": [], "cached": True}
+
+        decode_log = []
+        if req["batch"]:
+            named = [("粘贴文本.txt", input_text.encode("utf-8"))] if input_text.strip() else []
+            named += [(f.name, f.getvalue()) for f in files]
+            model_name = f"{nlp.meta['lang']}_{nlp.meta['name']}" if mode == "spacy" else None
+            stats, per_file = batch_extract(named, mode, 1, None, model_name, req["english_only"], workers=JOB_CPU_SHARE, progress=job.progress)
+            cache.put(cache_key, {"stats": stats.to_dict(), "per_file": [[n, p.to_dict()] for n, p in per_file]})
+        else:
+            # spacy (精准) 模型不可用时自动回退到 nltk (快速)；
+            # spaCy 在任务线程内单进程运行：nlp.pipe 的多进程用默认的 fork 启动，在线程里 fork 不安全
+            stats, per_file = LemmaStats(), []
+            for _, pieces, progress in iter_documents(input_text, files, decode_log, req["english_only"], pdf_workers=JOB_CPU_SHARE, progress=job.progress):
+                stats.merge(extract_stats(pieces, mode, 1, None, nlp=nlp, progress=progress, n_process=1))
+            cache.put(cache_key, {"stats": stats.to_dict()})
+        return {"stats": stats, "per_file": per_file, "decode_log": [d for d in decode_log if d], "cached": False}
+
+def lemmatizer_ready():
+    """图书馆页按 lemma 检索前确保 WordNet 就绪 (预热可能尚未完成或被关闭)；离线缺资源时提示并返回 False"""
     try:
-        ext = filename.split('.')[-1].lower()
-        if ext == 'docx':
-            return "\n".join([p.text for p in Document(file_obj).paragraphs if p.text.strip()])
-        raw = file_obj.read()
-        return raw.decode(chardet.detect(raw)['encoding'] or 'utf-8', errors='ignore')
-    except: return ""
-
-def process_words(text, mode, min_len, filter_set=None):
-    with st.spinner(f"正在词性还原中..."):
-        time.sleep(0.5)
-        
-        final_lemmas = []
-        
-        # === Scheme A: Spacy (High Accuracy Mode) ===
-        if mode == "spacy" and nlp_spacy:
-            # 1. Increase limit slightly
-            nlp_spacy.max_length = 2000000 
-            
-            # 2. Chunking to prevent memory errors
-            chunk_size = 100000 
-            text_chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
-            
-            progress_bar = st.progress(0)
-            
-            for i, chunk in enumerate(text_chunks):
-                progress_bar.progress((i + 1) / len(text_chunks))
-                
-                doc = nlp_spacy(chunk)
-                
-                for token in doc:
-                    # Basic filtering
-                    if (token.is_alpha and 
-                        not token.is_stop and 
-                        len(token.text) >= min_len and
-                        token.pos_ in ['NOUN', 'VERB', 'ADJ', 'ADV']):
-                        
-                        lemma = token.lemma_.lower()
-                        
-                        # [CRITICAL FIX] 强制正则校验：必须全是 a-z
-                        if not re.match(r"^[a-z]+$", lemma):
-                            continue
-
-                        # User Filter
-                        if filter_set and lemma in filter_set:
-                            continue
-                            
-                        final_lemmas.append(lemma)
-            
-            progress_bar.empty() 
+        ensure_nltk_resources(["wordnet", "omw-1.4"])
+        load_nltk_corpora(["wordnet"])
+        return True
+    except LookupError as e:
+        st.error(f"离线模式下缺少 NLTK 资源，请预先下载: {e}")
+        return False
+
+def apply_result(result):
+    """任务结果 (未过滤的 lemma 统计) 存入会话；过滤与排序在每次渲染时由 apply_view 在内存中完成"""
+    st.session_state.result_raw = result
+    st.session_state.shuffle_seed = random.randrange(1 << 30)  # 固定随机顺序，调整其它设置时不重排
+    st.session_state.decode_log = result["decode_log"]
+
+def apply_view(raw, min_len, filter_set, sort_order, top_n):
+    """对未过滤的统计重新应用最短词长、熟词屏蔽、截取前 N 个和排序 (毫秒级，不重跑 NLP)"""
+    order = {"按词频排序": "frequency", "A-Z 排序": "alpha"}.get(sort_order, "appearance")
+    stats = raw["stats"].filtered(min_len, filter_set)
+    words = stats.words(order, top_n)
+    per_file = [[n, p.filtered(min_len, filter_set).words(order, top_n)] for n, p in raw["per_file"]]
+    if sort_order == "随机打乱":
+        rng = random.Random(st.session_state.get("shuffle_seed", 0))
+        for lst in [words] + [w for _, w in per_file]: rng.shuffle(lst)
+
+    st.session_state.result_words = words
+    st.session_state.result_stats = stats
+    st.session_state.per_file = per_file
+
+@st.fragment(run_every=1)
+def job_panel():
+    """当前会话的提取任务：轮询进度、可取消；结束后把结果写入 session_state 并整页刷新"""
+    jobs = get_job_queue()
+    job = jobs.get(st.session_state.job_id)
+    if job is not None and job.active:
+        with st.container(border=True):
+            if job.state == "queued": st.info(f"⏳ 排队中，前面还有 {jobs.position(job.id)} 个任务")
+            else: st.progress(job.fraction, text=f"正在词性还原中... {job.fraction:.0%}")
+            if st.button("⏹️ 取消提取", key="cancel_job"): jobs.cancel(job.id)
+        return
+
+    del st.session_state.job_id
+    if job is None:
+        st.session_state.job_message = ("error", "任务已过期，请重新提取")
+    else:
+        jobs.discard(job.id)
+        if job.state == "done":
+            apply_result(job.result)
+            if job.result["cached"]: st.session_state.job_message = ("toast", "⚡ 命中缓存，已直接返回结果")
+        elif job.state == "failed": st.session_state.job_message = ("error", f"提取失败: {job.error}")
+        else: st.session_state.job_message = ("toast", "⏹️ 已取消提取")
+    st.rerun()
+
+@st.fragment(run_every=3)
+def publish_status():
+    """侧边栏：后台发布任务的最新状态 (定时局部刷新)"""
+    jobs = sorted(get_publisher().status().items())[-5:]
+    icons = {"queued": "⏳", "publishing": "☁️", "done": "✅", "failed": "❌"}
+    for _, job in reversed(jobs):
+        st.caption(f"{icons[job['state']]} {job['file']} · {job['time']}" + (f" · {job['error']}" if job["error"] else ""))
 
-        # === Scheme B: NLTK (Fast / Fallback Mode) ===
-        else:
-            # NLTK logic (already uses Regex [A-Za-z], so it's safe)
-            cleaned = [re.sub(r'[^a-z]', '', w.lower()) for w in re.findall(r"[A-Za-z-]+", text) if w]
-            l = WordNetLemmatizer()
-            lemmatized = [l.lemmatize(w) for w in cleaned]
-            
-            stops = set(stopwords.words('english'))
-            for w in lemmatized:
-                # Double check specifically for NLTK just in case
-                if len(w) >= min_len and w not in stops and (not filter_set or w not in filter_set):
-                    if re.match(r"^[a-z]+$", w): 
-                        final_lemmas.append(w)
-
-        # Remove duplicates
-        return list(dict.fromkeys(final_lemmas))
 def copy_btn(text):
     safe_text = json.dumps(text)
     components.html(f"""
@@ -308,6 +407,9 @@ with st.sidebar:
     menu = st.radio("MAIN MENU", ["⚡ 智能工作台", "📚 公共词书库", "👤 个人中心"], label_visibility="collapsed")
     st.markdown("---")
     st.info("📢 字幕文件无需转换，直接拖入即可。")
+    _cs = get_result_cache().stats()
+    st.caption(f"⚡ 结果缓存：命中 {_cs['hits']} / 未命中 {_cs['misses']} · {_cs['entries']} 条 · {_cs['bytes'] / 1024 / 1024:.1f} MB")
+    if get_publisher(): publish_status()
 
 # 顶部导航
 st.markdown("""
@@ -375,9 +477,14 @@ if "工作台" in menu:
     with col_conf:
         with st.container(border=True):
             st.markdown("##### 🛠️ 提取配置")
-            nlp_mode = st.selectbox("AI 引擎", ["nltk (快速)", "spacy (精准)"])
-            sort_order = st.selectbox("排序", ["按文本出现顺序", "A-Z 排序", "随机打乱"])
+            nlp_mode = st.selectbox("AI 引擎", list(ENGINE_OPTIONS))
+            mode_key = ENGINE_OPTIONS[nlp_mode]
+            if ENGINE_WARMUP: warm_up(mode_key)
+            sort_order = st.selectbox("排序", ["按文本出现顺序", "按词频排序", "A-Z 排序", "随机打乱"])
+            top_n = st.number_input("只保留高频前 N 词 (0 = 全部)", min_value=0, value=0, step=100)
             min_len = st.slider("最短词长", 2, 15, 3)
+            english_only = st.checkbox("双语字幕仅保留英文行", value=False)
+            batch_mode = st.checkbox("多文件并行 & 按文件输出", value=False)
             
             st.divider()
             st.markdown("##### 🛡️ 熟词屏蔽")
@@ -390,7 +497,7 @@ if "工作台" in menu:
             st.markdown("""
             <div style="display:flex; justify-content:space-between; margin-bottom:10px;">
                 <b>📄 输入源 (Input Source)</b>
-                <span style="font-size:12px; color:#64748b; background:#f1f5f9; padding:2px 6px; border-radius:4px;">支持 .txt .srt .docx</span>
+                <span style="font-size:12px; color:#64748b; background:#f1f5f9; padding:2px 6px; border-radius:4px;">支持 .txt .srt .ass .docx .pdf</span>
             </div>
             """, unsafe_allow_html=True)
             
@@ -404,31 +511,39 @@ if "工作台" in menu:
             st.markdown("<br>", unsafe_allow_html=True)
             start_btn = st.button("🚀 开始智能提取", type="primary")
 
-    # 逻辑处理
+    # 逻辑处理：提取交给后台任务队列，本次脚本运行立即返回
     if start_btn:
-        full_text = input_text
-        if uploaded_files:
-            for f in uploaded_files:
-                full_text += "\n" + extract_text_from_bytes(f, f.name)
-        
-        if not full_text.strip():
+        if not input_text.strip() and not uploaded_files:
             st.warning("⚠️ 请先输入文本或上传文件")
+        elif st.session_state.get("job_id"):
+            st.warning("⚠️ 上一个提取任务还在进行中，可先取消")
         else:
-            filter_set = set()
-            for p in selected_presets:
-                if os.path.exists(PRESET_WORDLISTS[p]):
-                    with open(PRESET_WORDLISTS[p], 'r', encoding='utf-8') as f: filter_set.update(f.read().splitlines())
-            if filter_file:
-                filter_set.update(filter_file.getvalue().decode('utf-8', errors='ignore').splitlines())
-            
-            mode_key = "spacy" if "spacy" in nlp_mode else "nltk"
-            words = process_words(full_text, mode_key, min_len, filter_set)
-            
-            if sort_order == "A-Z 排序": words.sort()
-            elif sort_order == "随机打乱": random.shuffle(words)
-            
-            st.session_state.result_words = words
-            st.rerun()
+            files = snapshot_files(uploaded_files)
+            batch = batch_mode and len(files) > 1
+            req = {"mode": mode_key, "english_only": english_only, "batch": batch,
+                   "input_text": input_text, "files": files, "cache": get_result_cache()}
+            # 进度单位：批量模式按文件数，否则按输入大小 (粘贴文本的字符数 + 上传文件的字节数)
+            total = len(files) + bool(input_text.strip()) if batch else len(input_text) + sum(f.size for f in files)
+            try:
+                st.session_state.job_id = get_job_queue().submit(run_extraction, req, total=total)
+            except JobQueueFull:
+                st.error("🚦 服务器繁忙，排队任务已满，请稍后再试")
+
+    if st.session_state.get("job_id"): job_panel()
+    kind, msg = st.session_state.pop("job_message", (None, None))
+    if kind == "error": st.error(msg)
+    elif kind == "toast": st.toast(msg)
+
+    # 最短词长 / 熟词屏蔽 / 排序的调整直接作用于已提取的 lemma 统计，无需再点提取
+    if st.session_state.get("result_raw"):
+        try:
+            with metrics.span("filter_build"):
+                custom = [load_custom_wordlist(filter_file.getvalue())] if filter_file else []
+                filter_set = get_wordlist_index().union([PRESET_WORDLISTS[p] for p in selected_presets], custom)
+            with metrics.span("refilter"):
+                apply_view(st.session_state.result_raw, min_len, filter_set, sort_order, int(top_n))
+        except LookupError as e:
+            st.error(f"离线模式下缺少 NLTK 资源，请预先下载: {e}")
 
     # 3. 结果展示
     if st.session_state.result_words:
@@ -439,6 +554,8 @@ if "工作台" in menu:
             
             st.markdown(f"### 🎉 提取结果 (共 {len(words)} 词)")
             st.text_area("Result", value=content_str, height=200, label_visibility="collapsed")
+            for d in st.session_state.get("decode_log", []):
+                st.caption(f"📄 {d['file']}：{d['encoding']} ({d['method']}，检测 {d['detect_ms']:.1f} ms)")
             
             c1, c2, c3 = st.columns([1, 1, 1])
             with c1: copy_btn(content_str)
@@ -453,6 +570,30 @@ if "工作台" in menu:
                             if name.endswith(".txt"): save_to_github_library(name, content_str, title, desc)
                             else: st.error("文件名需以 .txt 结尾")
 
+            # 词频统计导出：次数 / 首次出现的字符偏移 / 出现在几个文件里
+            stats = st.session_state.get("result_stats")
+            if stats is not None:
+                rows = stats.rows(words)
+                csv_buf = io.StringIO()
+                writer = csv.DictWriter(csv_buf, ["word", "count", "first_offset", "df", "pos"])
+                writer.writeheader(); writer.writerows(rows)
+                s1, s2 = st.columns(2)
+                s1.download_button("📊 词频统计 (.csv)", csv_buf.getvalue(), "vocab_stats.csv", "text/csv", use_container_width=True)
+                s2.download_button("📊 词频统计 (.json)", json.dumps({"docs": stats.docs, "words": rows}, ensure_ascii=False, indent=2),
+                                   "vocab_stats.json", "application/json", use_container_width=True)
+
+            # 批量模式：每个文件单独的词表
+            per_file = st.session_state.get("per_file", [])
+            if per_file:
+                st.divider()
+                st.markdown("##### 📂 按文件拆分")
+                st.dataframe([{"文件": n, "词数": len(w)} for n, w in per_file], use_container_width=True, hide_index=True)
+                buf = io.BytesIO()
+                with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+                    for i, (n, w) in enumerate(per_file, 1):
+                        zf.writestr(f"{i:02d}_{os.path.splitext(n)[0]}.txt", "\n".join(w))
+                st.download_button("🗂️ 下载每个文件的词表 (.zip)", buf.getvalue(), "vocab_per_file.zip", "application/zip", use_container_width=True)
+
 # === 📚 公共词书库 ===
 elif "词书库" in menu:
     # 顶部工具栏卡片
@@ -461,26 +602,51 @@ elif "词书库" in menu:
         q = c_search.text_input("搜索", placeholder="🔍 搜索书名...", label_visibility="collapsed")
         c_filter.multiselect("筛选", ["考研", "雅思", "托福"], label_visibility="collapsed", placeholder="标签筛选")
 
-    # 动态读取 Library (修复点：从本地目录读取)
-    try:
-        with open(os.path.join(LIBRARY_DIR, "info.json"), "r", encoding="utf-8") as f: book_info = json.load(f)
-    except: book_info = {}
-    
-    files = [f for f in os.listdir(LIBRARY_DIR) if f.endswith(".txt")]
-    visible = [f for f in files if q.lower() in f.lower() or q.lower() in book_info.get(f, {}).get("title", "").lower()]
+        # 倒排索引检索：按单词找书 / 按词汇量匹配难度
+        with st.expander("🔎 词汇检索 & 难度匹配"):
+            index = get_search_index()
+            index.sync(get_library_catalog())  # 只会重新索引有变化的书
+            titles = {b["file"]: b["title"] or b["file"] for b in get_library_catalog().entries()}
+            c_word, c_match = st.columns(2)
+            with c_word:
+                word_q = st.text_input("查词", placeholder="例如 malignant：哪些书包含这个词？")
+                if word_q.strip():
+                    w = word_q.strip().lower()
+                    hits = list(dict.fromkeys(index.books_with(w) + (index.books_with(nltk_lemma(w)) if w.isascii() and w.isalpha() and lemmatizer_ready() else [])))
+                    if hits:
+                        for f in hits: st.markdown(f"- 📘 {titles.get(f, f)} <small>({f})</small>", unsafe_allow_html=True)
+                    else: st.caption("没有词书包含这个词")
+            with c_match:
+                known_file = st.file_uploader("上传熟词表或文章，推荐难度最合适的词书", type=["txt", "srt"])
+                if known_file:
+                    tokens = {t.lower() for t in re.findall(r"[A-Za-z]+", known_file.getvalue().decode("utf-8", errors="ignore"))}
+                    known = tokens | ({nltk_lemma(t) for t in tokens} if lemmatizer_ready() else set())
+                    for r in index.rank(known, limit=5):
+                        st.markdown(f"- 📘 {titles.get(r['file'], r['file'])}：覆盖 **{r['coverage']:.0%}** ({r['overlap']}/{r['words']} 词)")
+
+    # 目录索引：元数据常驻内存，正文只在打开时读取
+    catalog = get_library_catalog()
+    visible = catalog.search(q)
     
     if not visible:
         st.info("📭 暂无数据，请先去工作台发布词书。")
     else:
+        # 分页：搜索词变化时回到第一页
+        if st.session_state.get("lib_query") != q:
+            st.session_state.lib_query, st.session_state.lib_page = q, 1
+        pages = math.ceil(len(visible) / LIBRARY_PAGE_SIZE)
+        page = min(st.session_state.get("lib_page", 1), pages)
+        start = (page - 1) * LIBRARY_PAGE_SIZE
+
         st.markdown("<br>", unsafe_allow_html=True)
         cols = st.columns(4)
         colors = ["#fef3c7", "#d1fae5", "#dbeafe", "#fee2e2", "#f3e8ff"]
         txt_colors = ["#92400e", "#065f46", "#1e40af", "#991b1b", "#6b21a8"]
         
-        for i, f in enumerate(visible):
-            meta = book_info.get(f, {})
-            title = meta.get("title", f)
-            desc = meta.get("desc", "无描述")
+        for i, book in enumerate(visible[start:start + LIBRARY_PAGE_SIZE], start):
+            f = book["file"]
+            title = book["title"]
+            desc = book["desc"]
             idx = i % 5
             
             with cols[i % 4]:
@@ -492,12 +658,28 @@ elif "词书库" in menu:
                 """, unsafe_allow_html=True)
                 
                 with st.expander("操作"):
-                    try:
-                        with open(os.path.join(LIBRARY_DIR, f), 'r', encoding='utf-8') as _f: content = _f.read()
-                        st.caption(f"文件名: {f}")
-                        st.download_button("⬇️ 下载", content, f)
-                        copy_btn(content)
-                    except: st.error("文件读取失败")
+                    st.caption(f"文件名: {f} · {book['words']} 词 · {book['size'] / 1024:.1f} KB" + (f" · {book['date']}" if book["date"] else ""))
+                    # 只有点开的那本书才读取正文并注入页面
+                    if st.session_state.get("open_book") != f:
+                        if st.button("📖 打开", key=f"open_{f}"):
+                            st.session_state.open_book = f
+                            st.rerun()
+                    else:
+                        try:
+                            content = catalog.read(f)
+                            st.download_button("⬇️ 下载", content, f)
+                            copy_btn(content)
+                        except: st.error("文件读取失败")
+
+        if pages > 1:
+            c_prev, c_info, c_next = st.columns([1, 2, 1])
+            if c_prev.button("⬅️ 上一页", disabled=page <= 1, use_container_width=True):
+                st.session_state.lib_page = page - 1
+                st.rerun()
+            c_info.markdown(f"<div style='text-align:center; padding-top:8px;'>第 {page} / {pages} 页 · 共 {len(visible)} 本</div>", unsafe_allow_html=True)
+            if c_next.button("下一页 ➡️", disabled=page >= pages, use_container_width=True):
+                st.session_state.lib_page = page + 1
+                st.rerun()
 
 else:
     st.info("🚧 个人中心开发中...")
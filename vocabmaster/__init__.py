@@ -0,0 +1,5 @@
+# VocabMaster 提取引擎：不依赖 Streamlit，可直接 import 或通过 `python -m vocabmaster` 命令行使用
+from vocabmaster.ingest import iter_text_from_bytes, extract_text_from_bytes, detect_encoding
+from vocabmaster.engine import extract_words, extract_stats, extract_file, LemmaStats, batch_extract, prepare_engine, get_spacy_model
+from vocabmaster.wordlists import Wordlist, FilterSet, WordlistIndex, normalize_wordlist
+from vocabmaster.cache import ResultCache, result_cache_key
@@ -0,0 +1,316 @@
+# 离线基准测试：在词书库 / 熟词表和合成的字幕、小说语料上测量各提取引擎的
+# 吞吐 (tokens/s)、峰值内存、分阶段耗时，以及引擎之间的 lemma 重合度；
+# 结果可保存为 JSON 基线，之后用 --compare 检查性能回退：
+#   python -m vocabmaster.bench --sizes 1,10 --save bench_baseline.json
+#   python -m vocabmaster.bench --sizes 1,10 --compare bench_baseline.json
+import os
+import sys
+import glob
+import json
+import time
+import random
+import platform
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from vocabmaster.ingest import iter_text_from_bytes, iter_lines
+from vocabmaster.engine import (extract_stats, prepare_engine, iter_text_chunks, nltk_lemma, nltk_pos_lemma, load_stopwords,
+                                get_pos_tagger, _iter_sentences, _TOKEN_RE, _LEMMA_RE, _PENN_TO_WN, SPACY_KEEP_PIPES, SPACY_POS)
+from vocabmaster.wordlists import WordlistIndex
+
+# Optional resource (峰值 RSS，仅 Unix)
+try:
+    import resource
+    _HAS_RESOURCE = True
+except ImportError:
+    _HAS_RESOURCE = False
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(ROOT, ".cache", "bench")
+SYNTHETIC_SIZES_MB = [1, 10, 100]
+SYNTHETIC_KINDS = ["subtitle", "novel"]
+# 合成语料的随机种子 (固定，保证每次生成的语料完全一致)
+SEED = 20240601
+# 与基线相比吞吐下降 / 内存上升超过这个比例即视为回退
+TOLERANCE = 0.15
+
+_CJK_LINES = ["我不知道你在说什么。", "快走吧！", "这不可能。", "你还好吗？", "我们明天见。"]
+_FALLBACK_VOCAB = "time people year way day thing man world life hand part child eye woman place work week case point".split()
+
+# --- 语料 ---
+def _load_vocab():
+    """合成语料的词汇来源：熟词表 + 词书库里的全部单词"""
+    words = set()
+    for path in glob.glob(os.path.join(ROOT, "wordlists", "*.txt")) + glob.glob(os.path.join(ROOT, "library", "*.txt")):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            words.update(w for w in (line.strip().lower() for line in f) if w.isascii() and w.isalpha())
+    return sorted(words) or _FALLBACK_VOCAB
+
+class _WordSource:
+    """按 Zipf 分布抽词，并随机加上常见屈折词尾，让词形还原有活干"""
+    SUFFIXES = ["", "", "", "", "s", "ed", "ing", "er", "ly"]
+
+    def __init__(self, vocab, rng):
+        self.rng = rng
+        self.vocab = vocab[:]
+        rng.shuffle(self.vocab)
+        self.cum = []
+        total = 0.0
+        for rank in range(len(self.vocab)):
+            total += 1.0 / (rank + 1)
+            self.cum.append(total)
+
+    def words(self, n):
+        return [w + self.rng.choice(self.SUFFIXES) for w in self.rng.choices(self.vocab, cum_weights=self.cum, k=n)]
+
+    def sentence(self, lo=4, hi=16):
+        words = self.words(self.rng.randint(lo, hi))
+        return words[0].capitalize() + " " + " ".join(words[1:]) + self.rng.choice([".", ".", ".", "?", "!"])
+
+def _iter_novel(src, rng):
+    chapter = 1
+    while True:
+        yield f"\n\nChapter {chapter}\n\n"
+        for _ in range(rng.randint(20, 60)):
+            sentences = [src.sentence() for _ in range(rng.randint(2, 8))]
+            if rng.random() < 0.3: sentences.insert(0, f'"{src.sentence(2, 8)}" {src.words(1)[0]} said.')
+            yield " ".join(sentences) + "\n\n"
+        chapter += 1
+
+def _iter_subtitle(src, rng):
+    n, ms = 1, 0
+    def ts(t): return f"{t // 3600000:02d}:{t // 60000 % 60:02d}:{t // 1000 % 60:02d},{t % 1000:03d}"
+    while True:
+        start, ms = ms, ms + rng.randint(800, 4000)
+        lines = [src.sentence(2, 9) for _ in range(rng.randint(1, 2))]
+        if rng.random() < 0.2: lines[0] = f"<i>{lines[0]}</i>"
+        if rng.random() < 0.3: lines.append(rng.choice(_CJK_LINES))  # 双语字幕
+        yield f"{n}\n{ts(start)} --> {ts(ms)}\n" + "\n".join(lines) + "\n\n"
+        n, ms = n + 1, ms + rng.randint(0, 500)
+
+def synthetic_corpus(kind, size_mb, vocab=None):
+    """生成 (或复用已生成的) 合成语料文件，返回路径"""
+    ext = "srt" if kind == "subtitle" else "txt"
+    path = os.path.join(CORPUS_DIR, f"{kind}-{size_mb}MB-{SEED}.{ext}")
+    if os.path.exists(path): return path
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    rng = random.Random(f"{SEED}-{kind}")
+    src = _WordSource(vocab or _load_vocab(), rng)
+    target, written = size_mb * 1024 * 1024, 0
+    with open(path + ".tmp", "w", encoding="utf-8", newline="\n") as f:
+        for block in (_iter_subtitle if kind == "subtitle" else _iter_novel)(src, rng):
+            f.write(block)
+            written += len(block.encode("utf-8"))
+            if written >= target: break
+    os.replace(path + ".tmp", path)
+    return path
+
+def bundled_corpus(name):
+    """把仓库自带的 library/*.txt 或 wordlists/*.txt 拼成一个语料文件"""
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    path = os.path.join(CORPUS_DIR, f"{name}.txt")
+    with open(path + ".tmp", "wb") as out:
+        for src in sorted(glob.glob(os.path.join(ROOT, name, "*.txt"))):
+            with open(src, "rb") as f: out.write(f.read().rstrip(b"\n") + b"\n")
+    os.replace(path + ".tmp", path)
+    return path
+
+def build_corpora(sizes=SYNTHETIC_SIZES_MB, kinds=SYNTHETIC_KINDS, bundled=("library", "wordlists")):
+    corpora = [(name, bundled_corpus(name)) for name in bundled]
+    vocab = _load_vocab()
+    for size in sizes:
+        for kind in kinds: corpora.append((f"{kind}-{size}MB", synthetic_corpus(kind, size, vocab)))
+    return corpora
+
+# --- 单个用例 (在独立子进程中运行，保证峰值 RSS 和各级缓存互不干扰) ---
+def _peak_rss_mb():
+    if not _HAS_RESOURCE: return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def _keep(lemma, min_len, stops, filter_set):
+    return len(lemma) >= min_len and lemma not in stops and lemma not in filter_set and _LEMMA_RE.match(lemma)
+
+def _stages_nltk(chunks, min_len, filter_set):
+    stages = {}
+    t = time.perf_counter()
+    counters = [Counter(_TOKEN_RE.findall(c)) for c in chunks]
+    stages["tokenize"] = time.perf_counter() - t
+    t = time.perf_counter()
+    forms = dict.fromkeys(raw.lower().replace("-", "") for c in counters for raw in c)
+    lemmas = [nltk_lemma(w) for w in forms if w]
+    stages["lemmatize"] = time.perf_counter() - t
+    t = time.perf_counter()
+    stops = load_stopwords()
+    kept = {lemma for lemma in lemmas if _keep(lemma, min_len, stops, filter_set)}
+    stages["filter"] = time.perf_counter() - t
+    return stages, sum(sum(c.values()) for c in counters), len(kept)
+
+def _stages_nltk_pos(chunks, min_len, filter_set):
+    stages = {}
+    t = time.perf_counter()
+    sentences = [words for c in chunks for words, _ in _iter_sentences(c)]
+    stages["tokenize"] = time.perf_counter() - t
+    t = time.perf_counter()
+    tagger = get_pos_tagger()
+    pairs = dict.fromkeys(pair for words in sentences for pair in tagger.tag(words))
+    stages["tag"] = time.perf_counter() - t
+    t = time.perf_counter()
+    lemmas = {nltk_pos_lemma(raw.lower().replace("-", ""), _PENN_TO_WN[tag]) for raw, tag in pairs if tag in _PENN_TO_WN}
+    stages["lemmatize"] = time.perf_counter() - t
+    t = time.perf_counter()
+    stops = load_stopwords()
+    kept = {lemma for lemma in lemmas if _keep(lemma, min_len, stops, filter_set)}
+    stages["filter"] = time.perf_counter() - t
+    return stages, sum(len(_TOKEN_RE.findall(c)) for c in chunks), len(kept)
+
+def _stages_spacy(nlp, chunks, min_len, filter_set):
+    stages = {}
+    chunks = [c for c in chunks if c.strip()]
+    t = time.perf_counter()
+    for _ in nlp.tokenizer.pipe(chunks): pass
+    stages["tokenize"] = time.perf_counter() - t
+    # tokens/s 统一按 NLTK 的单词正则计数，两种引擎才可比 (spaCy 的 token 还包含标点)
+    tokens = sum(len(_TOKEN_RE.findall(c)) for c in chunks)
+    # 逐个 Doc 取出候选 lemma 后即丢弃，不把整份语料的 Doc 留在内存里；过滤耗时单独累计
+    t, filter_s, kept = time.perf_counter(), 0.0, set()
+    disable = [p for p in nlp.pipe_names if p not in SPACY_KEEP_PIPES]
+    for doc in nlp.pipe(chunks, disable=disable, n_process=1):
+        f = time.perf_counter()
+        kept.update(tok.lemma_.lower() for tok in doc
+                    if tok.is_alpha and not tok.is_stop and len(tok.text) >= min_len and tok.pos_ in SPACY_POS)
+        filter_s += time.perf_counter() - f
+    stages["lemmatize"] = time.perf_counter() - t - filter_s
+    f = time.perf_counter()
+    kept = {lemma for lemma in kept if _LEMMA_RE.match(lemma) and lemma not in filter_set}
+    stages["filter"] = filter_s + time.perf_counter() - f
+    return stages, tokens, len(kept)
+
+def _run_case(task):
+    corpus, path, engine, min_len, filter_paths = task
+    nlp = prepare_engine(engine)
+    if engine == "spacy" and nlp is None: return None
+    filter_set = frozenset(WordlistIndex().union(filter_paths))
+    name = os.path.basename(path)
+
+    # 端到端：与 App / CLI 完全相同的流式路径，冷缓存；先跑并立即记下峰值 RSS，
+    # 之后的分阶段计时会把整份语料读进内存，不能让它决定峰值
+    t = time.perf_counter()
+    with open(path, "rb") as f: stats = extract_stats(iter_text_from_bytes(f, name), engine, min_len, filter_set, nlp=nlp, n_process=1)
+    total = time.perf_counter() - t
+    peak_rss = _peak_rss_mb()
+
+    # 分阶段计时 (各阶段单独跑一遍，便于定位瓶颈)
+    t = time.perf_counter()
+    with open(path, "rb") as f: chunks = list(iter_text_chunks(iter_lines(iter_text_from_bytes(f, name))))
+    stages = {"decode": time.perf_counter() - t}
+    nltk_lemma.cache_clear(); nltk_pos_lemma.cache_clear()
+    if nlp: more, tokens, _ = _stages_spacy(nlp, chunks, min_len, filter_set)
+    elif engine == "nltk-pos": more, tokens, _ = _stages_nltk_pos(chunks, min_len, filter_set)
+    else: more, tokens, _ = _stages_nltk(chunks, min_len, filter_set)
+    stages.update(more)
+    del chunks
+    return {
+        "corpus": corpus, "engine": f"spacy:{nlp.meta['name']}" if nlp else engine,
+        "bytes": os.path.getsize(path), "tokens": tokens, "lemmas": len(stats.counts),
+        "seconds": round(total, 4), "tokens_per_sec": round(tokens / total, 1) if total else None,
+        "mb_per_sec": round(os.path.getsize(path) / 1048576 / total, 3) if total else None,
+        "peak_rss_mb": peak_rss, "stages": {k: round(v, 4) for k, v in stages.items()},
+        "words": stats.words(),
+    }
+
+def run_case(corpus, path, engine, min_len=3, filter_paths=()):
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+        return ex.submit(_run_case, (corpus, path, engine, min_len, list(filter_paths))).result()
+
+# --- 汇总 / 基线 ---
+def lemma_overlap(a, b):
+    """两个引擎结果的重合度：jaccard 以及各自被对方覆盖的比例"""
+    a, b = set(a), set(b)
+    inter = len(a & b)
+    return {"jaccard": round(inter / len(a | b), 4) if a | b else 1.0,
+            "a_in_b": round(inter / len(a), 4) if a else 1.0, "b_in_a": round(inter / len(b), 4) if b else 1.0}
+
+def run_suite(corpora, engines, min_len=3, filter_paths=(), log=print):
+    results, overlap = [], []
+    for corpus, path in corpora:
+        by_engine = {}
+        for engine in engines:
+            log(f"· {corpus} / {engine} ...")
+            r = run_case(corpus, path, engine, min_len, filter_paths)
+            if r is None:
+                log(f"  {engine} 不可用，跳过")
+                continue
+            by_engine[r["engine"]] = r.pop("words")
+            results.append(r)
+        names = list(by_engine)
+        for i, a in enumerate(names):
+            for b in names[i + 1:]:
+                overlap.append({"corpus": corpus, "a": a, "b": b, **lemma_overlap(by_engine[a], by_engine[b])})
+    return {"meta": {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+                     "platform": platform.platform(), "cpu_count": os.cpu_count(), "min_len": min_len,
+                     "filters": [os.path.basename(p) for p in filter_paths]},
+            "results": results, "overlap": overlap}
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    """与基线逐项对比，返回回退列表 (吞吐下降、内存上升、输出词数变化)"""
+    base = {(r["corpus"], r["engine"]): r for r in baseline["results"]}
+    problems = []
+    for r in report["results"]:
+        b = base.get((r["corpus"], r["engine"]))
+        if not b: continue
+        key = f"{r['corpus']} / {r['engine']}"
+        if b["tokens_per_sec"] and r["tokens_per_sec"] < b["tokens_per_sec"] * (1 - tolerance):
+            problems.append(f"{key}: 吞吐 {r['tokens_per_sec']:.0f} < 基线 {b['tokens_per_sec']:.0f} tokens/s")
+        if b.get("peak_rss_mb") and r.get("peak_rss_mb") and r["peak_rss_mb"] > b["peak_rss_mb"] * (1 + tolerance):
+            problems.append(f"{key}: 峰值内存 {r['peak_rss_mb']:.0f} > 基线 {b['peak_rss_mb']:.0f} MB")
+        if r["lemmas"] != b["lemmas"]:
+            problems.append(f"{key}: 输出词数 {r['lemmas']} != 基线 {b['lemmas']}")
+    return problems
+
+def format_report(report):
+    lines = [f"{'corpus':<16}{'engine':<22}{'MB':>8}{'tokens/s':>12}{'rss MB':>9}{'decode':>9}{'token':>8}{'tag':>8}{'lemma':>8}{'filter':>8}{'total':>9}"]
+    for r in report["results"]:
+        s = r["stages"]
+        lines.append(f"{r['corpus']:<16}{r['engine']:<22}{r['bytes'] / 1048576:>8.1f}{r['tokens_per_sec'] or 0:>12.0f}"
+                     f"{r['peak_rss_mb'] or 0:>9.0f}{s['decode']:>9.2f}{s['tokenize']:>8.2f}{s.get('tag', 0):>8.2f}{s['lemmatize']:>8.2f}"
+                     f"{s['filter']:>8.2f}{r['seconds']:>9.2f}")
+    for o in report["overlap"]:
+        lines.append(f"overlap {o['corpus']}: {o['a']} vs {o['b']} jaccard={o['jaccard']:.3f} "
+                     f"a_in_b={o['a_in_b']:.3f} b_in_a={o['b_in_a']:.3f}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="vocabmaster.bench", description="提取引擎离线基准测试")
+    p.add_argument("--sizes", default=",".join(map(str, SYNTHETIC_SIZES_MB)), help="合成语料大小 (MB，逗号分隔，默认 1,10,100)")
+    p.add_argument("--kinds", default=",".join(SYNTHETIC_KINDS), help="合成语料类型 (subtitle,novel)")
+    p.add_argument("--engines", default="nltk,nltk-pos,spacy", help="参与测试的引擎 (默认 nltk,nltk-pos,spacy；spacy 不可用时跳过)")
+    p.add_argument("-m", "--min-len", type=int, default=3)
+    p.add_argument("--filter", action="append", default=[], metavar="FILE", help="熟词表，可重复指定")
+    p.add_argument("--save", metavar="FILE", help="把结果保存为 JSON 基线")
+    p.add_argument("--compare", metavar="FILE", help="与 JSON 基线对比，有回退时退出码为 1")
+    p.add_argument("--tolerance", type=float, default=TOLERANCE, help=f"允许的波动比例 (默认 {TOLERANCE})")
+    args = p.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    log = lambda msg: print(msg, file=sys.stderr)
+    log("准备语料...")
+    try: report = run_suite(build_corpora(sizes, kinds), [e.strip() for e in args.engines.split(",")], args.min_len, args.filter, log)
+    except LookupError as e:
+        log(f"vocabmaster.bench: 缺少 NLTK 资源: {e}")
+        return 2
+    print(format_report(report))
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=2)
+        log(f"基线已保存到 {args.save}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f: problems = compare(report, json.load(f), args.tolerance)
+        for msg in problems: print(f"REGRESSION {msg}")
+        return 1 if problems else 0
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,65 @@
+# 提取结果的磁盘缓存：以输入内容 + 提取参数的哈希为 key
+import os
+import json
+import hashlib
+import threading
+from vocabmaster.ingest import READ_BLOCK_SIZE
+from vocabmaster import metrics
+
+# 提取逻辑变化时递增，使旧缓存失效
+RESULT_CACHE_VERSION = 4
+
+class ResultCache:
+    """基于内容哈希的磁盘结果缓存，超过容量时按最近访问时间 (LRU) 淘汰"""
+    def __init__(self, root, max_bytes):
+        self.root, self.max_bytes = root, max_bytes
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f: entry = json.load(f)
+            os.utime(path)  # 刷新访问时间，用于 LRU
+        except (OSError, ValueError):
+            with self._lock: self.misses += 1
+            metrics.count("result_cache_total", result="miss")
+            return None
+        with self._lock: self.hits += 1
+        metrics.count("result_cache_total", result="hit")
+        return entry
+
+    def put(self, key, entry):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self):
+        entries = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(self.root) if e.name.endswith(".json")]
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes: break
+            try: os.remove(path)
+            except OSError: pass
+            total -= size
+
+    def stats(self):
+        sizes = [e.stat().st_size for e in os.scandir(self.root) if e.name.endswith(".json")]
+        return {"hits": self.hits, "misses": self.misses, "entries": len(sizes), "bytes": sum(sizes)}
+
+def result_cache_key(input_text, uploaded_files, engine, english_only=False):
+    """输入内容 + 引擎 (+ 字幕选项) 的哈希。缓存的是未过滤的 lemma 统计，
+    最短词长 / 屏蔽表在读取后于内存中应用，不参与 key"""
+    h = hashlib.sha256(f"v{RESULT_CACHE_VERSION}|{engine}|{int(english_only)}|".encode())
+    h.update(f"{len(input_text)}|".encode() + input_text.encode("utf-8"))
+    for f in uploaded_files or []:
+        h.update(f"|{f.name.split('.')[-1].lower()}|{f.size}|".encode())
+        for block in iter(lambda: f.read(READ_BLOCK_SIZE), b""): h.update(block)
+        f.seek(0)
+    return h.hexdigest()
@@ -0,0 +1,95 @@
+# 命令行批量提取 (无需浏览器)：
+#   python -m vocabmaster "subs/**/*.srt" -w 8 --filter wordlists/gaokao.txt -f json -o vocab.json
+#   cat book.txt | python -m vocabmaster --engine spacy
+import os
+import io
+import sys
+import csv
+import glob
+import json
+import time
+import argparse
+from vocabmaster.engine import batch_extract, prepare_engine, effective_mode, BATCH_WORKERS, DEFAULT_ENGINE
+from vocabmaster.wordlists import WordlistIndex
+
+def build_parser():
+    p = argparse.ArgumentParser(prog="vocabmaster", description="从文本/字幕/文档中批量提取生词 (词形还原 + 去重)")
+    p.add_argument("inputs", nargs="*", help="文件路径或 glob (支持 **)；省略或 '-' 时从 stdin 读取")
+    p.add_argument("-e", "--engine", choices=["nltk-pos", "nltk", "spacy"], default=DEFAULT_ENGINE,
+                   help=f"提取引擎：nltk-pos (词性感知) / nltk (最快) / spacy (默认 {DEFAULT_ENGINE})")
+    p.add_argument("-m", "--min-len", type=int, default=3, help="最短词长 (默认 3)")
+    p.add_argument("--filter", action="append", default=[], metavar="FILE", help="熟词表，可重复指定")
+    p.add_argument("--english-only", action="store_true", help="双语字幕仅保留英文行")
+    p.add_argument("-w", "--workers", type=int, default=BATCH_WORKERS, help=f"并行进程数 (默认 {BATCH_WORKERS})")
+    p.add_argument("-f", "--format", choices=["txt", "json", "csv"], default="txt", help="输出格式 (默认 txt)")
+    p.add_argument("--per-file", action="store_true", help="json/csv 输出中附带每个文件的词表")
+    p.add_argument("--sort", choices=["appearance", "frequency", "alpha"], default="appearance", help="排序方式 (默认按首次出现)")
+    p.add_argument("--top", type=int, default=0, metavar="N", help="只保留词频最高的 N 个词 (默认全部)")
+    p.add_argument("--stats", action="store_true", help="json/csv 输出中附带词频、首次出现偏移和文档频次")
+    p.add_argument("-o", "--output", help="输出文件 (默认 stdout)")
+    p.add_argument("--offline", action="store_true", help="不下载缺失的 NLTK 资源")
+    return p
+
+def expand_inputs(patterns):
+    """展开 glob，保持命令行顺序并去重；匹配不到的 pattern 原样当作路径"""
+    paths = []
+    for pat in patterns:
+        paths.extend(sorted(glob.glob(pat, recursive=True)) or [pat])
+    return list(dict.fromkeys(p for p in paths if p == "-" or os.path.isfile(p)))
+
+STATS_FIELDS = ["word", "count", "first_offset", "df", "pos"]
+
+def write_output(out, fmt, stats, per_file, order="appearance", top=0, with_files=False, with_stats=False):
+    words = stats.words(order, top)
+    if fmt == "txt":
+        out.write("\n".join(words) + "\n")
+    elif fmt == "json":
+        doc = {"count": len(words), "docs": stats.docs, "words": stats.rows(words) if with_stats else words}
+        if with_files:
+            doc["files"] = []
+            for f, s in per_file:
+                ws = s.words(order, top)
+                doc["files"].append({"file": f, "count": len(ws), "words": s.rows(ws) if with_stats else ws})
+        json.dump(doc, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    else:
+        fields = STATS_FIELDS if with_stats else ["word"]
+        writer = csv.writer(out)
+        if with_files:
+            writer.writerow(["file"] + fields)
+            for f, s in per_file:
+                writer.writerows([f] + [r[k] for k in fields] for r in s.rows(s.words(order, top)))
+        else:
+            writer.writerow(fields)
+            writer.writerows([r[k] for k in fields] for r in stats.rows(words))
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    t0 = time.perf_counter()
+
+    paths = expand_inputs(args.inputs) if args.inputs else ["-"]
+    if not paths:
+        print("vocabmaster: 没有匹配的输入文件", file=sys.stderr)
+        return 1
+    files = [("stdin.txt", sys.stdin.buffer.read()) if p == "-" else (p, p) for p in paths]
+
+    try: nlp = prepare_engine(args.engine, offline=args.offline or None)
+    except LookupError as e:
+        print(f"vocabmaster: 缺少 NLTK 资源: {e}", file=sys.stderr)
+        return 2
+    mode = effective_mode(args.engine, nlp)
+    model_name = f"{nlp.meta['lang']}_{nlp.meta['name']}" if nlp else None
+    filter_set = WordlistIndex().union(args.filter)
+
+    stats, per_file = batch_extract(files, mode, args.min_len, filter_set, model_name, args.english_only, args.workers)
+    opts = dict(order=args.sort, top=args.top, with_files=args.per_file, with_stats=args.stats)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            write_output(out, args.format, stats, per_file, **opts)
+    else:
+        out = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="", write_through=True)
+        write_output(out, args.format, stats, per_file, **opts)
+        out.detach()
+    print(f"vocabmaster: {len(files)} 个文件，{len(stats.words(top=args.top))} 个词，耗时 {time.perf_counter() - t0:.2f}s ({mode})", file=sys.stderr)
+    return 0
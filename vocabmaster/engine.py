@@ -0,0 +1,423 @@
+# 提取引擎：文本分块、spaCy / NLTK 词形还原，以及多文件并行批处理
+# (独立成模块：批处理进程池需要可被 pickle 的顶层函数)
+import io
+import os
+import re
+import heapq
+import functools
+import threading
+import importlib.util
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import nltk
+from nltk.stem import WordNetLemmatizer
+from nltk.corpus import stopwords
+from vocabmaster.ingest import iter_text_from_bytes, iter_lines, pool_context
+from vocabmaster import metrics
+
+# Optional Spacy (只探测是否安装，真正 import 推迟到第一次加载模型时)
+_HAS_SPACY = importlib.util.find_spec("spacy") is not None
+
+# spaCy 引擎参数 (可通过环境变量调整)
+SPACY_CHUNK_CHARS = int(os.environ.get("SPACY_CHUNK_CHARS", 20000))
+SPACY_BATCH_SIZE = int(os.environ.get("SPACY_BATCH_SIZE", 16))
+SPACY_N_PROCESS = int(os.environ.get("SPACY_N_PROCESS", os.cpu_count() or 1))
+# 词形还原只需要这些组件，parser / ner 等全部关闭
+SPACY_KEEP_PIPES = {"tok2vec", "transformer", "tagger", "morphologizer", "attribute_ruler", "lemmatizer"}
+SPACY_POS = {"NOUN", "VERB", "ADJ", "ADV"}
+_LEMMA_RE = re.compile(r"^[a-z]+$")
+_SENT_SPLIT_RE = re.compile(r"(?<=[.!?]\s)")
+# 最后一个空白字符 (空格、制表符、全角空格等)
+_LAST_SPACE_RE = re.compile(r"\s\S*$")
+
+# NLTK 引擎参数
+LEMMA_CACHE_SIZE = int(os.environ.get("LEMMA_CACHE_SIZE", 200000))
+_TOKEN_RE = re.compile(r"[A-Za-z-]+")
+_WNL = WordNetLemmatizer()
+# 词性感知的 NLTK 引擎：单词 (含连字符) 与标点分开成 token，句末标点处断句；
+# 缩写按 PTB 规则拆开 (Don't → Do n't, He's → He 's)，与标注器的训练语料一致；
+# 字幕里常见的弯撇号 ’ 同样拆开，并在送入标注器前换成 '
+_TAG_TOKEN_RE = re.compile(r"[A-Za-z]+(?=(?i:n[’']t)(?![A-Za-z]))|(?i:n[’']t|[’'](?:s|re|ve|ll|d|m))(?![A-Za-z])"
+                           r"|[A-Za-z]+(?:-[A-Za-z]+)*|[.!?]+|[^\sA-Za-z]")
+_SENT_END = frozenset(".!?")
+# Penn Treebank 标签 → WordNet 词性；与 spaCy 分支一致，只保留名/动/形/副 (专有名词 NNP* 不算)
+_PENN_TO_WN = {"NN": "n", "NNS": "n", "VB": "v", "VBD": "v", "VBG": "v", "VBN": "v", "VBP": "v", "VBZ": "v",
+               "JJ": "a", "JJR": "a", "JJS": "a", "RB": "r", "RBR": "r", "RBS": "r"}
+_WN_TO_UPOS = {"n": "NOUN", "v": "VERB", "a": "ADJ", "r": "ADV"}
+
+# 多文件批处理的进程数
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", os.cpu_count() or 1))
+
+# --- 资源懒加载：模型和语料只在第一次用到对应引擎时才加载 ---
+# NLTK 资源在 nltk.data 中的实际分类路径
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "averaged_perceptron_tagger": "taggers/averaged_perceptron_tagger",
+    "averaged_perceptron_tagger_eng": "taggers/averaged_perceptron_tagger_eng",
+    "wordnet": "corpora/wordnet",
+    "omw-1.4": "corpora/omw-1.4",
+    "stopwords": "corpora/stopwords",
+}
+# 各引擎需要的 NLTK 资源 (熟词表归一化依赖 wordnet，两种引擎都需要)
+ENGINE_NLTK_RESOURCES = {"nltk": ["wordnet", "omw-1.4", "stopwords"], "spacy": ["wordnet", "omw-1.4"],
+                         "nltk-pos": ["wordnet", "omw-1.4", "stopwords", "averaged_perceptron_tagger_eng"]}
+# 默认引擎：词性感知的 NLTK (质量接近 spaCy，开销小得多)
+DEFAULT_ENGINE = "nltk-pos"
+# 离线模式：从不调用 nltk.download，资源需预先打包进镜像
+OFFLINE = os.environ.get("VOCAB_OFFLINE", "") not in ("", "0")
+# spaCy 模型按优先级尝试 (逗号分隔)，默认先用高精度 Transformer 模型
+SPACY_MODELS = os.environ.get("SPACY_MODEL", "en_core_web_trf,en_core_web_md,en_core_web_sm").split(",")
+SPACY_EXCLUDE = ["parser", "ner"]
+
+_load_lock = threading.Lock()
+_nltk_ready = set()
+_corpora_loaded = set()
+_spacy_model = []
+_pos_tagger = []
+_warming = set()
+
+def ensure_nltk_resources(names, offline=None):
+    """缺失的资源才下载；离线模式下缺失直接抛 LookupError"""
+    offline = OFFLINE if offline is None else offline
+    for r in names:
+        if r in _nltk_ready: continue
+        with _load_lock:
+            try: nltk.data.find(NLTK_RESOURCES[r])
+            except LookupError:
+                if offline: raise
+                nltk.download(r, quiet=True)
+            _nltk_ready.add(r)
+
+def load_nltk_corpora(names):
+    """第一次访问 WordNet / 停用词语料：NLTK 的 LazyCorpusLoader 没有锁，首次访问时会原地替换自身，
+    多个线程同时触发会互相踩坏，所以放在加载锁内完成"""
+    for r in names:
+        if r in _corpora_loaded or r not in ("wordnet", "stopwords"): continue
+        with _load_lock:
+            if r in _corpora_loaded: continue
+            if r == "wordnet": nltk_lemma("warmup")
+            else: load_stopwords()
+            _corpora_loaded.add(r)
+
+def _load_spacy():
+    if not _HAS_SPACY: return None
+    import spacy
+    for name in SPACY_MODELS:
+        try: return spacy.load(name.strip(), exclude=SPACY_EXCLUDE)
+        except OSError: continue
+        except Exception: return None
+    return None
+
+def get_spacy_model():
+    """首次调用时加载 spaCy 模型 (之后复用)；没有可用模型时返回 None"""
+    if not _spacy_model:
+        with _load_lock:
+            if not _spacy_model: _spacy_model.append(_load_spacy())
+    return _spacy_model[0]
+
+def get_pos_tagger():
+    """首次调用时加载 NLTK 感知机词性标注器 (之后复用)"""
+    if not _pos_tagger:
+        with _load_lock:
+            if not _pos_tagger:
+                from nltk.tag import PerceptronTagger
+                _pos_tagger.append(PerceptronTagger())
+    return _pos_tagger[0]
+
+def prepare_engine(mode, offline=None):
+    """确保引擎所需资源就绪；spacy 模式返回模型 (不可用时为 None，调用方回退到 nltk)"""
+    resources = ENGINE_NLTK_RESOURCES.get(mode, ENGINE_NLTK_RESOURCES["nltk"])
+    ensure_nltk_resources(resources, offline)
+    load_nltk_corpora(resources)
+    if mode == "nltk-pos": get_pos_tagger()
+    return get_spacy_model() if mode == "spacy" else None
+
+def effective_mode(mode, nlp):
+    """实际使用的引擎：spacy 模型不可用时回退到 nltk"""
+    return "nltk" if mode == "spacy" and nlp is None else mode
+
+def warm_up(mode):
+    """后台线程预热引擎 (每种引擎只预热一次)，用户点击提取时模型往往已加载完毕"""
+    if mode in _warming: return
+    _warming.add(mode)
+    def run():
+        try: prepare_engine(mode)
+        except Exception: pass
+    threading.Thread(target=run, name=f"warmup-{mode}", daemon=True).start()
+
+@functools.lru_cache(maxsize=None)
+def load_stopwords():
+    return frozenset(stopwords.words('english'))
+
+def iter_text_chunks(lines, max_chars=SPACY_CHUNK_CHARS):
+    """按行/句子边界组块，保证不会把单词从中间切断"""
+    if isinstance(lines, str): lines = lines.splitlines(keepends=True)
+    buf, size = [], 0
+    for line in lines:
+        # 超长行 (整本书没有换行) 再按句子切，仍然过长则按空白切
+        pieces = [line] if len(line) <= max_chars else _SENT_SPLIT_RE.split(line)
+        for piece in pieces:
+            while len(piece) > max_chars:
+                m = _LAST_SPACE_RE.search(piece, 0, max_chars)
+                cut = m.start() if m and m.start() > 0 else max_chars
+                if buf: yield "".join(buf); buf, size = [], 0
+                yield piece[:cut]
+                piece = piece[cut:]
+            if size + len(piece) > max_chars and buf:
+                yield "".join(buf); buf, size = [], 0
+            buf.append(piece); size += len(piece)
+    if buf: yield "".join(buf)
+
+def iter_spacy_lemmas(nlp, chunks, min_len, filter_set=None, progress=None,
+                      batch_size=SPACY_BATCH_SIZE, n_process=SPACY_N_PROCESS):
+    """spaCy 引擎：文本块经 nlp.pipe 批量/多进程处理，只保留词形还原需要的组件。
+    逐个 yield (lemma, 1, 字符偏移, 词性)"""
+    nlp.max_length = max(nlp.max_length, SPACY_CHUNK_CHARS + 1)
+    disable = [p for p in nlp.pipe_names if p not in SPACY_KEEP_PIPES]
+
+    def with_offsets():
+        offset = 0
+        for c in chunks:
+            if c.strip(): yield c, offset
+            offset += len(c)
+
+    for doc, offset in nlp.pipe(with_offsets(), as_tuples=True, batch_size=batch_size, n_process=max(1, n_process), disable=disable):
+        if progress: progress(len(doc.text))
+        metrics.count("tokens_total", len(doc), engine="spacy")
+        for token in doc:
+            if not (token.is_alpha and not token.is_stop and len(token.text) >= min_len and token.pos_ in SPACY_POS):
+                continue
+            lemma = token.lemma_.lower()
+            # [CRITICAL FIX] 强制正则校验：必须全是 a-z
+            if not _LEMMA_RE.match(lemma): continue
+            if filter_set and lemma in filter_set: continue
+            yield lemma, 1, offset + token.idx, token.pos_
+
+@functools.lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def nltk_lemma(word):
+    """进程级词形还原缓存：同一词形只调用一次 WordNet"""
+    return _WNL.lemmatize(word)
+
+def iter_nltk_lemmas(chunks, min_len, filter_set=None, progress=None):
+    """NLTK 快速通道：每个原始词形在整个流中只还原/过滤一次，开销随词汇量而不是词数增长。
+    每块 yield (lemma, 该词形在块内的次数, 首次出现偏移 (已见过的词形为 -1), None)"""
+    stops = load_stopwords()
+    lemma_of = {}  # 原始 token → lemma (被过滤的为 None)
+    offset = 0
+    for chunk in chunks:
+        if progress: progress(len(chunk))
+        # 一次扫描同时完成计数并记下每个词形的首次出现位置 (dict 保持首次出现顺序)
+        counts, first = Counter(), {}
+        for m in _TOKEN_RE.finditer(chunk):
+            raw = m.group()
+            counts[raw] += 1
+            first.setdefault(raw, m.start())
+        metrics.count("tokens_total", sum(counts.values()), engine="nltk")
+        for raw, n in counts.items():
+            if raw in lemma_of:
+                if lemma_of[raw]: yield lemma_of[raw], n, -1, None
+                continue
+            w = raw.lower().replace("-", "")
+            lemma = nltk_lemma(w) if w else ""
+            if not (len(lemma) >= min_len and lemma not in stops and not (filter_set and lemma in filter_set) and _LEMMA_RE.match(lemma)):
+                lemma = None
+            lemma_of[raw] = lemma
+            if lemma: yield lemma, n, offset + first[raw], None
+        offset += len(chunk)
+
+@functools.lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def nltk_pos_lemma(word, pos):
+    """(词形, WordNet 词性) → lemma 的进程级缓存"""
+    return _WNL.lemmatize(word, pos)
+
+def _iter_sentences(chunk):
+    """把文本块切成句子，yield (token 列表, 各 token 的起始偏移)"""
+    words, starts = [], []
+    for m in _TAG_TOKEN_RE.finditer(chunk):
+        words.append(m.group().replace("’", "'")); starts.append(m.start())
+        if m.group()[0] in _SENT_END:
+            yield words, starts
+            words, starts = [], []
+    if words: yield words, starts
+
+def iter_nltk_pos_lemmas(chunks, min_len, filter_set=None, progress=None):
+    """词性感知的 NLTK 引擎：逐句做感知机词性标注，按词性还原 (running/ran → run)，
+    只保留名/动/形/副。(原始 token, 标签) → lemma 在整个流中只计算一次。
+    每块 yield (lemma, 块内次数, 首次出现偏移, 首次出现时的词性)"""
+    tagger, stops = get_pos_tagger(), load_stopwords()
+    lemma_of = {}  # (原始 token, 标签) → lemma (被过滤的为 None)
+    offset = 0
+    for chunk in chunks:
+        if progress: progress(len(chunk))
+        found, n_tokens = {}, 0  # lemma → [块内次数, 首次出现偏移, 词性]
+        for words, starts in _iter_sentences(chunk):
+            n_tokens += len(words)
+            for (raw, tag), start in zip(tagger.tag(words), starts):
+                key = (raw, tag)
+                if key in lemma_of: lemma = lemma_of[key]
+                else:
+                    pos, w = _PENN_TO_WN.get(tag), raw.lower().replace("-", "")
+                    lemma = nltk_pos_lemma(w, pos) if pos else ""
+                    if not (len(lemma) >= min_len and w not in stops and lemma not in stops
+                            and not (filter_set and lemma in filter_set) and _LEMMA_RE.match(lemma)):
+                        lemma = None
+                    lemma_of[key] = lemma
+                if lemma:
+                    f = found.get(lemma)
+                    if f is None: found[lemma] = [1, offset + start, _WN_TO_UPOS[_PENN_TO_WN[tag]]]
+                    else: f[0] += 1
+        metrics.count("tokens_total", n_tokens, engine="nltk-pos")
+        for lemma, (n, first, upos) in found.items(): yield lemma, n, first, upos
+        offset += len(chunk)
+
+class LemmaStats:
+    """一次遍历中累计的 lemma 统计：出现次数、首次出现的字符偏移、文档频次 (出现在几个文件里)、词性"""
+    def __init__(self):
+        self.counts = {}  # lemma -> 次数，插入顺序即首次出现顺序
+        self.first = {}   # lemma -> 首次出现的字符偏移 (跨文档累计)
+        self.df = {}      # lemma -> 文档频次
+        self.pos = {}     # lemma -> 首次出现时的词性 (NOUN/VERB/ADJ/ADV；nltk 快速通道没有)
+        self.docs = 0
+        self.chars = 0    # 已处理的总字符数，合并时用于平移偏移
+
+    def add_doc(self, lemmas):
+        """累计一个文档的 (lemma, 次数, 偏移, 词性) 流"""
+        counts, first, base = self.counts, self.first, self.chars
+        doc_lemmas = set()
+        for lemma, n, offset, pos in lemmas:
+            c = counts.get(lemma)
+            if c is None:
+                counts[lemma] = n
+                first[lemma] = base + max(offset, 0)
+                if pos: self.pos[lemma] = pos
+            else: counts[lemma] = c + n
+            doc_lemmas.add(lemma)
+        for lemma in doc_lemmas: self.df[lemma] = self.df.get(lemma, 0) + 1
+        self.docs += 1
+
+    def merge(self, other):
+        """按顺序合并另一份统计 (other 中的偏移整体后移 self.chars)"""
+        for lemma, n in other.counts.items():
+            if lemma in self.counts: self.counts[lemma] += n
+            else:
+                self.counts[lemma] = n
+                self.first[lemma] = self.chars + other.first[lemma]
+                if lemma in other.pos: self.pos[lemma] = other.pos[lemma]
+            self.df[lemma] = self.df.get(lemma, 0) + other.df[lemma]
+        self.docs += other.docs
+        self.chars += other.chars
+        return self
+
+    def words(self, order="appearance", top=None):
+        """order: appearance (首次出现) / frequency (词频降序) / alpha；top 只保留词频最高的 N 个"""
+        words = list(self.counts)
+        if top:
+            keep = set(heapq.nlargest(top, words, key=self.counts.__getitem__))
+            words = [w for w in words if w in keep]
+        if order == "frequency": words.sort(key=lambda w: -self.counts[w])
+        elif order == "alpha": words.sort()
+        return words
+
+    def filtered(self, min_len=1, filter_set=None):
+        """在内存中重新应用最短词长 / 熟词屏蔽，返回新的统计 (顺序、次数、偏移不变)。
+        配合以 min_len=1、不带屏蔽表提取的统计使用，调整过滤条件时无需重跑 NLP"""
+        out = LemmaStats()
+        keep = [w for w in self.counts if len(w) >= min_len and not (filter_set and w in filter_set)]
+        out.counts = {w: self.counts[w] for w in keep}
+        out.first = {w: self.first[w] for w in keep}
+        out.df = {w: self.df[w] for w in keep}
+        out.pos = {w: self.pos[w] for w in keep if w in self.pos}
+        out.docs, out.chars = self.docs, self.chars
+        return out
+
+    def rows(self, words=None):
+        return [{"word": w, "count": self.counts[w], "first_offset": self.first[w], "df": self.df[w], "pos": self.pos.get(w, "")}
+                for w in (self.counts if words is None else words)]
+
+    def to_dict(self):
+        return {"counts": self.counts, "first": self.first, "df": self.df, "pos": self.pos, "docs": self.docs, "chars": self.chars}
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls()
+        stats.counts, stats.first, stats.df, stats.pos = d["counts"], d["first"], d["df"], d.get("pos", {})
+        stats.docs, stats.chars = d["docs"], d["chars"]
+        return stats
+
+def extract_stats(pieces, mode, min_len, filter_set=None, nlp=None, progress=None, n_process=SPACY_N_PROCESS):
+    """单个文档的完整提取流程：文本片段 → 分块 → 词形还原/过滤 → 计数 (保留首次出现顺序)"""
+    chars = [0]
+    def counted(chunks):
+        for c in chunks:
+            chars[0] += len(c)
+            yield c
+    engine = effective_mode(mode, nlp)
+    # 读取/解码与 NLP 交错进行：单独累计解码耗时，其余记为词形还原 (含分词和过滤)
+    pieces = metrics.TimedIter(pieces, "decode")
+    chunks = counted(iter_text_chunks(iter_lines(pieces)))
+    with metrics.span("extract", engine=engine) as sp:
+        if engine == "spacy":
+            lemmas = iter_spacy_lemmas(nlp, chunks, min_len, filter_set, progress=progress, n_process=n_process)
+        elif engine == "nltk-pos":
+            lemmas = iter_nltk_pos_lemmas(chunks, min_len, filter_set, progress=progress)
+        else:
+            lemmas = iter_nltk_lemmas(chunks, min_len, filter_set, progress=progress)
+        stats = LemmaStats()
+        stats.add_doc(lemmas)
+        stats.chars = chars[0]
+    pieces.close()
+    metrics.observe("lemmatize", sp.elapsed - pieces.elapsed, engine=engine)
+    metrics.count("chars_total", stats.chars)
+    # tokens_total 由各引擎在分词处按块累计；这里只记过滤后保留下来的 lemma 出现次数
+    metrics.count("lemmas_kept_total", sum(stats.counts.values()), engine=engine)
+    return stats
+
+def extract_words(pieces, mode, min_len, filter_set=None, nlp=None, progress=None, n_process=SPACY_N_PROCESS):
+    """只要去重后的词表 (首次出现顺序) 时的便捷入口"""
+    return extract_stats(pieces, mode, min_len, filter_set, nlp, progress, n_process).words()
+
+def extract_file(path, mode=DEFAULT_ENGINE, min_len=3, filter_set=None, english_only=False):
+    """提取单个文件 (路径) 的词频统计，供脚本/批处理直接调用"""
+    nlp = prepare_engine(mode)
+    with open(path, "rb") as f:
+        pieces = iter_text_from_bytes(f, os.path.basename(path), english_only=english_only)
+        return extract_stats(pieces, mode, min_len, filter_set, nlp=nlp)
+
+@functools.lru_cache(maxsize=None)
+def _worker_spacy(model_name):
+    import spacy
+    return spacy.load(model_name, exclude=SPACY_EXCLUDE)
+
+def _extract_file(task):
+    """批处理 worker：处理单个文件 (bytes 或文件路径)，进程内不再嵌套多进程"""
+    name, data, mode, min_len, filter_set, model_name, english_only = task
+    nlp = _worker_spacy(model_name) if mode == "spacy" and model_name and _HAS_SPACY else None
+    with (open(data, "rb") if isinstance(data, str) else io.BytesIO(data)) as f:
+        pieces = iter_text_from_bytes(f, name, english_only=english_only, pdf_workers=1)
+        return extract_stats(pieces, mode, min_len, filter_set, nlp=nlp, n_process=1)
+
+def batch_extract(files, mode, min_len, filter_set=None, model_name=None, english_only=False, workers=BATCH_WORKERS, progress=None):
+    """多文件并行提取。files 为 [(文件名, bytes 或文件路径)]，返回 (合并统计, [(文件名, LemmaStats)])，
+    合并统计按文件顺序保留全局首次出现顺序。progress(1) 在每个文件完成时调用，抛异常即中止剩余文件"""
+    filter_set = frozenset(filter_set or ())
+    tasks = [(name, data, mode, min_len, filter_set, model_name, english_only) for name, data in files]
+    results = []
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            results.append(_extract_file(task))
+            if progress: progress(1)
+    else:
+        # 子进程内的阶段统计不会回传，这里只记录整体耗时
+        workers = min(workers, len(tasks))
+        with metrics.span("batch_extract", engine=mode), ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as ex:
+            try:
+                for stats in ex.map(_extract_file, tasks, chunksize=max(1, len(tasks) // (workers * 4))):
+                    results.append(stats)
+                    if progress: progress(1)
+            except BaseException:
+                ex.shutdown(wait=False, cancel_futures=True)
+                raise
+    per_file = [(name, stats) for (name, _), stats in zip(files, results)]
+    merged = LemmaStats()
+    for _, stats in per_file: merged.merge(stats)
+    return merged, per_file
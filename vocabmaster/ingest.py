@@ -0,0 +1,184 @@
+# 文档读取层：编码检测、增量解码、字幕/docx/pdf 解析，全部以生成器形式流式输出文本片段
+# (独立成模块：PDF 进程池需要可被 pickle 的顶层函数)
+import io
+import os
+import re
+import time
+import codecs
+import multiprocessing
+import chardet
+from concurrent.futures import ProcessPoolExecutor
+from docx import Document
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from vocabmaster import metrics
+
+# Optional PDF
+try:
+    from pypdf import PdfReader
+    _HAS_PDF = True
+except ImportError:
+    _HAS_PDF = False
+
+# 字幕解析
+_SRT_TIME_RE = re.compile(r"\s*\d{1,2}:\d{2}:\d{2}[,.]\d{1,3}\s*-->")
+_SUB_TAG_RE = re.compile(r"<[^>]*>|\{[^}]*\}")
+_ASS_BREAK_RE = re.compile(r"\\[Nn]")
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af\uff00-\uffef]")
+_LAST_SPACE_RE = re.compile(r"\s\S*$")
+
+# 流式读取块大小
+READ_BLOCK_SIZE = int(os.environ.get("READ_BLOCK_SIZE", 1 << 20))
+# PDF 按页并行抽取：页数达到阈值才启用进程池
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", os.cpu_count() or 1))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", 16))
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", 8))
+# 进程池启动方式：池由任务线程创建，fork 会把其它线程持有的锁 (如 metrics._lock) 原样复制进子进程而死锁
+POOL_START_METHOD = os.environ.get("POOL_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+# 没有换行的超长文本按此长度截断
+MAX_LINE_CHARS = int(os.environ.get("MAX_LINE_CHARS", 20000))
+# 编码统计检测只看前 64KB
+DETECT_SAMPLE_BYTES = int(os.environ.get("DETECT_SAMPLE_BYTES", 64 << 10))
+
+_BOMS = [(codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"), (codecs.BOM_UTF8, "utf-8-sig"),
+         (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")]
+
+def detect_encoding(sample):
+    """分级检测编码：BOM → 严格 UTF-8 → 小样本 chardet，返回 (编码, 检测方式)"""
+    for bom, enc in _BOMS:
+        if sample.startswith(bom): return enc, "bom"
+    try:
+        # 增量解码器允许样本末尾截断半个字符
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8", "utf-8"
+    except UnicodeDecodeError:
+        pass
+    enc = (chardet.detect(sample[:DETECT_SAMPLE_BYTES])['encoding'] or 'utf-8').lower()
+    # GB2312/GBK 都是 GB18030 的子集，统一按超集解码，避免生僻字丢失
+    if enc in ("gb2312", "gbk"): enc = "gb18030"
+    return enc, "chardet"
+
+def _iter_decoded(file_obj, filename, block_size, info):
+    block = file_obj.read(block_size)
+    t0 = time.perf_counter()
+    with metrics.span("detect_encoding"): enc, method = detect_encoding(block)
+    try: decoder = codecs.getincrementaldecoder(enc)(errors='ignore')
+    except LookupError: enc, decoder = 'utf-8', codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    info.update(file=filename, encoding=enc, method=method, detect_ms=(time.perf_counter() - t0) * 1000)
+    while block:
+        metrics.count("bytes_read_total", len(block))
+        yield decoder.decode(block)
+        block = file_obj.read(block_size)
+    yield decoder.decode(b"", final=True)
+
+def _clean_subtitle_lines(texts, english_only):
+    """去掉残留标记、空行和连续重复行；english_only 时丢弃含中日韩文字的行 (双语字幕)"""
+    prev = None
+    for t in texts:
+        t = _SUB_TAG_RE.sub("", t).strip()
+        if not t or t == prev or (english_only and _CJK_RE.search(t)): continue
+        prev = t
+        yield t + "\n"
+
+def iter_srt_text(lines, english_only=False):
+    """SRT 解析：跳过序号和时间轴，只输出台词"""
+    texts = (l for l in lines if l.strip() and not l.strip().isdigit() and not _SRT_TIME_RE.match(l))
+    yield from _clean_subtitle_lines(texts, english_only)
+
+def iter_ass_text(lines, english_only=False):
+    """ASS/SSA 解析：只取 Dialogue 行的 Text 字段，\\N 换行拆成多行"""
+    def texts():
+        for l in lines:
+            if not l.startswith("Dialogue:"): continue
+            fields = l.rstrip("\r\n").split(",", 9)
+            if len(fields) < 10: continue
+            text = _SUB_TAG_RE.sub("", fields[9]).replace("\\h", " ")
+            yield from _ASS_BREAK_RE.sub("\n", text).split("\n")
+    yield from _clean_subtitle_lines(texts(), english_only)
+
+SUBTITLE_PARSERS = {"srt": iter_srt_text, "ass": iter_ass_text, "ssa": iter_ass_text}
+
+# --- 文档解析 (docx / pdf) ---
+def iter_docx_text(file_obj):
+    """按文档顺序流式输出段落和表格单元格文本 (合并单元格只输出一次)"""
+    with metrics.span("docx_parse"): doc = Document(file_obj)
+    for child in doc.element.body.iterchildren():
+        if child.tag.endswith("}p"):
+            text = Paragraph(child, doc).text
+            if text.strip(): yield text + "\n"
+        elif child.tag.endswith("}tbl"):
+            seen = set()
+            for row in Table(child, doc).rows:
+                for cell in row.cells:
+                    if cell._tc in seen: continue
+                    seen.add(cell._tc)
+                    if cell.text.strip(): yield cell.text + "\n"
+
+_pdf_reader = None
+
+def _pdf_worker_init(data):
+    global _pdf_reader
+    _pdf_reader = PdfReader(io.BytesIO(data))
+
+def _pdf_pages_text(page_range):
+    return [_pdf_reader.pages[i].extract_text() or "" for i in range(*page_range)]
+
+def pool_context():
+    """进程池使用的 multiprocessing 上下文 (不使用 fork)"""
+    return multiprocessing.get_context(POOL_START_METHOD)
+
+def iter_pdf_text(file_obj, workers=PDF_WORKERS):
+    """逐页输出 PDF 文本；页数较多时按页段分发到进程池并行抽取，按原页序产出"""
+    data = file_obj.read()
+    metrics.count("bytes_read_total", len(data))
+    with metrics.span("pdf_parse"): reader = PdfReader(io.BytesIO(data))
+    if reader.is_encrypted: reader.decrypt("")
+    n = len(reader.pages)
+    if workers <= 1 or n < PDF_PARALLEL_MIN_PAGES or reader.is_encrypted:
+        for page in reader.pages: yield (page.extract_text() or "") + "\n"
+        return
+    ranges = [(i, min(i + PDF_PAGES_PER_TASK, n)) for i in range(0, n, PDF_PAGES_PER_TASK)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), initializer=_pdf_worker_init, initargs=(data,), mp_context=pool_context()) as ex:
+        for texts in ex.map(_pdf_pages_text, ranges):
+            for t in texts: yield t + "\n"
+
+def iter_text_from_bytes(file_obj, filename, block_size=READ_BLOCK_SIZE, info=None, english_only=False, pdf_workers=None):
+    """流式读取上传文件：逐块增量解码，不在内存里拼出整份文本。
+    字幕文件只输出台词；传入 info 字典时会写入所用编码与检测耗时"""
+    info = {} if info is None else info
+    try:
+        ext = filename.split('.')[-1].lower()
+        if ext == 'docx':
+            yield from iter_docx_text(file_obj)
+            return
+        if ext == 'pdf':
+            if _HAS_PDF: yield from iter_pdf_text(file_obj, pdf_workers or PDF_WORKERS)
+            return
+        decoded = _iter_decoded(file_obj, filename, block_size, info)
+        if ext in SUBTITLE_PARSERS:
+            yield from SUBTITLE_PARSERS[ext](iter_lines(decoded), english_only)
+        else:
+            yield from decoded
+    except Exception:
+        return
+
+def extract_text_from_bytes(file_obj, filename):
+    return "".join(iter_text_from_bytes(file_obj, filename))
+
+def iter_lines(pieces, max_chars=MAX_LINE_CHARS):
+    """把任意切分的文本流还原成完整的行，跨片段的半行会被拼回去"""
+    tail = ""
+    for piece in pieces:
+        lines = (tail + piece).splitlines(keepends=True)
+        tail = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+        # 没有换行的超长文本：在空白处截断，避免 tail 无限增长
+        # 用下标推进而不是反复切片，整段只复制一次
+        pos = 0
+        while len(tail) - pos > max_chars:
+            m = _LAST_SPACE_RE.search(tail, pos, pos + max_chars)
+            cut = m.start() + 1 if m else pos + max_chars
+            yield tail[pos:cut]
+            pos = cut
+        if pos: tail = tail[pos:]
+    if tail: yield tail
@@ -0,0 +1,111 @@
+# 后台提取任务队列：进程内共享一个有界线程池，限制同时运行的重任务数，
+# 脚本线程只负责提交和轮询，rerun 不会打断正在进行的提取
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from vocabmaster import metrics
+
+# 同时运行的提取任务数 (全局并发上限)，超出的排队
+JOB_WORKERS = int(os.environ.get("VOCAB_JOB_WORKERS", 2))
+# 排队 + 运行中的任务上限，超过时拒绝新任务
+JOB_MAX_PENDING = int(os.environ.get("VOCAB_JOB_MAX_PENDING", 64))
+# 已结束任务的结果保留多久 (秒)，过期后清理
+JOB_TTL = float(os.environ.get("VOCAB_JOB_TTL", 600))
+# 每个任务可用的 CPU 份额：批处理 / PDF 抽取进程数按此上限，避免 任务数 × 进程数 超订 CPU
+JOB_CPU_SHARE = max(1, (os.cpu_count() or 1) // JOB_WORKERS)
+
+class JobCancelled(Exception):
+    pass
+
+class JobQueueFull(RuntimeError):
+    pass
+
+class Job:
+    """单个任务的状态；progress() 由任务函数在处理过程中调用，同时作为取消检查点"""
+    def __init__(self, total=0):
+        self.id = uuid.uuid4().hex[:12]
+        self.state = "queued"   # queued / running / done / failed / cancelled
+        self.done, self.total = 0, total
+        self.result = self.error = None
+        self.created, self.finished = time.time(), None
+        self._cancel = threading.Event()
+        self._future = None
+
+    def progress(self, n):
+        self.done += n
+        if self._cancel.is_set(): raise JobCancelled(self.id)
+
+    @property
+    def fraction(self):
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING):
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, total=0, **kwargs):
+        """提交任务 fn(job, *args, **kwargs)，立即返回任务 ID；队列已满时抛 JobQueueFull"""
+        with self._lock:
+            self._prune()
+            if sum(j.active for j in self._jobs.values()) >= self.max_pending: raise JobQueueFull(self.max_pending)
+            job = Job(total)
+            self._jobs[job.id] = job
+        job._future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        if job._cancel.is_set(): return self._finish(job, "cancelled")
+        job.state = "running"
+        metrics.observe("job_wait", time.time() - job.created)
+        try:
+            job.result = fn(job, *args, **kwargs)
+            self._finish(job, "done")
+        except JobCancelled:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            self._finish(job, "failed")
+
+    def _finish(self, job, state):
+        job.state, job.finished = state, time.time()
+
+    def get(self, job_id):
+        with self._lock: return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """排队中的任务直接取消；运行中的任务在下一个进度检查点退出"""
+        job = self.get(job_id)
+        if job is None or not job.active: return
+        job._cancel.set()
+        if job._future is not None and job._future.cancel(): self._finish(job, "cancelled")
+
+    def discard(self, job_id):
+        """结果已被会话取走后释放内存"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and not job.active: del self._jobs[job_id]
+
+    def _prune(self):
+        now = time.time()
+        for job_id in [k for k, j in self._jobs.items() if j.finished and now - j.finished > JOB_TTL]: del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            states = [j.state for j in self._jobs.values()]
+        return {"running": states.count("running"), "queued": states.count("queued")}
+
+    def position(self, job_id):
+        """排队中的任务前面还有几个"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != "queued": return 0
+            return sum(1 for j in self._jobs.values() if j.state == "queued" and j.created < job.created)
@@ -0,0 +1,71 @@
+# 词书库目录索引：书名/描述/日期/词数/大小/内容哈希常驻内存，
+# 只有文件 mtime 或大小变化时才重新统计，正文按需读取
+import os
+import json
+import time
+import hashlib
+import threading
+
+# 两次目录扫描的最小间隔 (秒)，避免每次 rerun 都 stat 整个目录
+SCAN_TTL = float(os.environ.get("LIBRARY_SCAN_TTL", 2.0))
+
+def _stat_book(path):
+    """流式统计词数 (非空行数) 和 sha256，不把整本书留在内存里"""
+    h, words = hashlib.sha256(), 0
+    with open(path, "rb") as f:
+        for line in f:
+            h.update(line)
+            if line.strip(): words += 1
+    return words, h.hexdigest()
+
+class LibraryCatalog:
+    def __init__(self, root):
+        self.root = root
+        self._books = {}    # filename -> entry
+        self._stats = {}    # filename -> (mtime_ns, size, words, sha256)
+        self._info = (None, {})
+        self._scanned = 0.0
+        self._lock = threading.Lock()
+
+    def _load_info(self):
+        path = os.path.join(self.root, "info.json")
+        try: mtime = os.stat(path).st_mtime_ns
+        except OSError: return {}
+        if self._info[0] != mtime:
+            try:
+                with open(path, "r", encoding="utf-8") as f: self._info = (mtime, json.load(f))
+            except (OSError, ValueError): self._info = (mtime, {})
+        return self._info[1]
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and time.monotonic() - self._scanned < SCAN_TTL: return
+            info = self._load_info()
+            books = {}
+            for e in os.scandir(self.root):
+                if not e.name.endswith(".txt") or not e.is_file(): continue
+                st = e.stat()
+                cached = self._stats.get(e.name)
+                if not cached or cached[:2] != (st.st_mtime_ns, st.st_size):
+                    try: cached = (st.st_mtime_ns, st.st_size) + _stat_book(e.path)
+                    except OSError: continue
+                    self._stats[e.name] = cached
+                meta = info.get(e.name, {})
+                books[e.name] = {"file": e.name, "title": meta.get("title", e.name), "desc": meta.get("desc", "无描述"),
+                                 "date": meta.get("date", ""), "words": cached[2], "size": cached[1], "sha256": cached[3]}
+            for gone in set(self._stats) - set(books): del self._stats[gone]
+            self._books = books
+            self._scanned = time.monotonic()
+
+    def entries(self):
+        self.refresh()
+        return [self._books[k] for k in sorted(self._books)]
+
+    def search(self, q):
+        q = q.lower()
+        return [b for b in self.entries() if q in b["file"].lower() or q in b["title"].lower()]
+
+    def read(self, filename):
+        """按需读取正文 (只在用户打开某本书时调用)"""
+        if filename not in self._books: raise KeyError(filename)
+        with open(os.path.join(self.root, filename), "r", encoding="utf-8") as f: return f.read()
@@ -0,0 +1,185 @@
+# 轻量埋点：各阶段耗时 (span) 与计数器 (字节 / token / 缓存命中)，
+# 进程内汇总后以 Prometheus 文本格式暴露，每次请求结束再输出一行 JSON 日志；
+# 设置 VOCAB_PROFILE 目录后，每次请求还会用采样剖析器记录调用栈 (collapsed 格式，可直接画火焰图)
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 每次请求结束时向 stderr 输出一行 JSON (设为 0 关闭)
+METRICS_LOG = os.environ.get("VOCAB_METRICS_LOG", "1") not in ("", "0")
+# Prometheus 抓取端口 (0 = 不启动)
+METRICS_PORT = int(os.environ.get("VOCAB_METRICS_PORT", 0))
+# 采样剖析：输出目录 (空 = 关闭) 与采样间隔 (秒)
+PROFILE_DIR = os.environ.get("VOCAB_PROFILE", "")
+PROFILE_INTERVAL = float(os.environ.get("VOCAB_PROFILE_INTERVAL", 0.005))
+
+_lock = threading.Lock()
+_counters = Counter()   # (name, labels) -> 累计值
+_spans = {}             # (stage, labels) -> [次数, 总耗时, 最大耗时]
+_trace = contextvars.ContextVar("vocab_trace", default=None)
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def count(name, n=1, **labels):
+    """累加计数器 (同时计入当前请求)"""
+    with _lock: _counters[_key(name, labels)] += n
+    trace = _trace.get()
+    if trace is not None: trace["counters"][name] = trace["counters"].get(name, 0) + n
+
+def observe(stage, seconds, **labels):
+    """记录一次阶段耗时"""
+    with _lock:
+        s = _spans.setdefault(_key(stage, labels), [0, 0.0, 0.0])
+        s[0] += 1; s[1] += seconds; s[2] = max(s[2], seconds)
+    trace = _trace.get()
+    if trace is not None: trace["spans"][stage] = round(trace["spans"].get(stage, 0.0) + seconds, 6)
+
+class _Span:
+    elapsed = 0.0
+
+@contextmanager
+def span(stage, **labels):
+    """with span("decode"): ... —— 计时并记录到阶段统计，as 得到的对象在退出后带 elapsed"""
+    s = _Span()
+    t = time.perf_counter()
+    try: yield s
+    finally:
+        s.elapsed = time.perf_counter() - t
+        observe(stage, s.elapsed, **labels)
+
+class TimedIter:
+    """包装一个 (流式) 迭代器，只统计它自身产出元素所花的时间，耗尽时记为一个阶段"""
+    def __init__(self, it, stage, **labels):
+        self._it, self.stage, self.labels = iter(it), stage, labels
+        self.elapsed, self._done = 0.0, False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t = time.perf_counter()
+        try: return next(self._it)
+        except StopIteration:
+            self.close()
+            raise
+        finally: self.elapsed += time.perf_counter() - t
+
+    def close(self):
+        if not self._done:
+            self._done = True
+            observe(self.stage, self.elapsed, **self.labels)
+
+@contextmanager
+def request_trace(kind, **fields):
+    """一次请求 (提取 / 发布) 的范围：收集期间的 span 和计数，结束时输出一行 JSON 日志"""
+    trace = {"request": kind, "id": uuid.uuid4().hex[:12], **fields, "spans": {}, "counters": {}}
+    token = _trace.set(trace)
+    profiler = SamplingProfiler(threading.get_ident()).start() if PROFILE_DIR else None
+    t = time.perf_counter()
+    try: yield trace
+    except BaseException as e:
+        trace["error"] = type(e).__name__
+        raise
+    finally:
+        trace["seconds"] = round(time.perf_counter() - t, 6)
+        _trace.reset(token)
+        observe(f"request_{kind}", trace["seconds"])
+        count("requests_total", kind=kind)
+        if profiler: trace["profile"] = profiler.stop().dump(os.path.join(PROFILE_DIR, f"{kind}-{trace['id']}.folded"))
+        if METRICS_LOG: print(json.dumps(trace, ensure_ascii=False, default=str), file=sys.stderr, flush=True)
+
+# --- 导出 ---
+def snapshot():
+    with _lock:
+        return {"counters": [{"name": n, "labels": dict(lb), "value": v} for (n, lb), v in _counters.items()],
+                "spans": [{"stage": n, "labels": dict(lb), "count": c, "seconds": s, "max": m}
+                          for (n, lb), (c, s, m) in _spans.items()]}
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(pairs, **extra):
+    items = list(pairs) + list(extra.items())
+    if not items: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+def render_prometheus():
+    """Prometheus 文本格式 (0.0.4)"""
+    lines = []
+    with _lock:
+        for name in sorted({n for n, _ in _counters}):
+            lines.append(f"# TYPE vocab_{name} counter")
+            lines += [f"vocab_{name}{_labels(lb)} {v}" for (n, lb), v in sorted(_counters.items()) if n == name]
+        lines.append("# TYPE vocab_stage_seconds summary")
+        for (stage, lb), (c, s, _) in sorted(_spans.items()):
+            lines.append(f"vocab_stage_seconds_sum{_labels(lb, stage=stage)} {s:.6f}")
+            lines.append(f"vocab_stage_seconds_count{_labels(lb, stage=stage)} {c}")
+        lines.append("# TYPE vocab_stage_seconds_max gauge")
+        lines += [f"vocab_stage_seconds_max{_labels(lb, stage=stage)} {m:.6f}" for (stage, lb), (_, _, m) in sorted(_spans.items())]
+    return "\n".join(lines) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics": body, ctype = render_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json": body, ctype = json.dumps(snapshot()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0"):
+    """后台线程提供 /metrics (Prometheus) 和 /metrics.json；port 为 0 时不启动"""
+    if not port: return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+# --- 采样剖析 ---
+class SamplingProfiler:
+    """后台线程定时抓取目标线程的调用栈 (sys._current_frames)，开销与采样间隔成正比，与被测代码无关"""
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id, self.interval = thread_id, interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})")
+                frame = frame.f_back
+            if stack: self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        """写出 collapsed stacks (flamegraph.pl / speedscope 可直接读取)，返回路径"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common(): f.write(f"{stack} {n}\n")
+        return path
@@ -0,0 +1,88 @@
+# 后台发布队列：词表文件和 library/info.json 在同一个 Git commit 里提交，
+# 复用同一个已认证的 GitHub 客户端，短时间内的多次发布合并成一次 commit
+import json
+import time
+import queue
+import threading
+import itertools
+from github import Github, GithubException, InputGitTreeElement, UnknownObjectException
+from vocabmaster import metrics
+
+# 合并窗口：收到第一个任务后再等这么久，把期间到达的任务一起提交
+COALESCE_SECONDS = 1.0
+# ref 已被他人更新 (SHA 变化) 时的重试次数
+MAX_RETRIES = 5
+# 保留最近多少个任务的状态
+STATUS_KEEP = 50
+
+class GithubPublisher:
+    """单后台线程的发布队列。submit() 立即返回任务 ID，状态通过 status() 查询"""
+    def __init__(self, token, repo_name, library_path="library"):
+        self.token, self.repo_name, self.library_path = token, repo_name, library_path
+        self._queue = queue.Queue()
+        self._status = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._repo = None
+        threading.Thread(target=self._run, name="github-publisher", daemon=True).start()
+
+    def submit(self, filename, content, meta):
+        job_id = next(self._ids)
+        self._set(job_id, filename, "queued")
+        self._queue.put((job_id, filename, content, meta))
+        return job_id
+
+    def status(self):
+        with self._lock: return dict(self._status)
+
+    def _set(self, job_id, filename, state, error=None):
+        with self._lock:
+            self._status[job_id] = {"file": filename, "state": state, "error": error, "time": time.strftime("%H:%M:%S")}
+            for old in sorted(self._status)[:-STATUS_KEEP]: del self._status[old]
+
+    def _get_repo(self):
+        if self._repo is None: self._repo = Github(self.token).get_repo(self.repo_name)
+        return self._repo
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            deadline = time.monotonic() + COALESCE_SECONDS
+            while True:
+                try: jobs.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty: break
+            # 同一文件多次发布时只保留最后一次
+            latest = {filename: (job_id, filename, content, meta) for job_id, filename, content, meta in jobs}
+            for job_id, filename, _, _ in jobs: self._set(job_id, filename, "publishing")
+            try:
+                with metrics.span("github_commit"): self._commit(list(latest.values()))
+                for job_id, filename, _, _ in jobs: self._set(job_id, filename, "done")
+                metrics.count("publish_jobs_total", len(jobs), state="done")
+            except Exception as e:
+                self._repo = None  # 下次重新建立连接
+                for job_id, filename, _, _ in jobs: self._set(job_id, filename, "failed", str(e))
+                metrics.count("publish_jobs_total", len(jobs), state="failed")
+
+    def _commit(self, jobs):
+        repo = self._get_repo()
+        info_path = f"{self.library_path}/info.json"
+        names = ", ".join(filename for _, filename, _, _ in jobs)
+        for attempt in range(MAX_RETRIES):
+            ref = repo.get_git_ref(f"heads/{repo.default_branch}")
+            base = repo.get_git_commit(ref.object.sha)
+            try: info = json.loads(repo.get_contents(info_path, ref=base.sha).decoded_content.decode())
+            except UnknownObjectException: info = {}  # 只有 404 才是还没有 info.json；限流 / 5xx / 认证错误让任务失败，不能覆盖已有元数据
+            elements = []
+            for _, filename, content, meta in jobs:
+                info[filename] = meta
+                elements.append(InputGitTreeElement(f"{self.library_path}/{filename}", "100644", "blob", content=content))
+            elements.append(InputGitTreeElement(info_path, "100644", "blob", content=json.dumps(info, ensure_ascii=False, indent=2)))
+            tree = repo.create_git_tree(elements, base.tree)
+            commit = repo.create_git_commit(f"Publish {names}", tree, [base])
+            try:
+                ref.edit(commit.sha)  # 非快进更新会被拒绝 → 基于最新 ref 重试
+                return
+            except GithubException as e:
+                if e.status not in (409, 422) or attempt == MAX_RETRIES - 1: raise
+                metrics.count("publish_retries_total")
+                time.sleep(0.5 * (attempt + 1))
@@ -0,0 +1,156 @@
+# 词书库倒排索引：单词 → 包含它的书 (整数 ID 的有序 posting list)，
+# 另存书 → 单词的正排列表用于书与书之间的集合运算。
+# 持久化为 meta.json + index.bin，启动时 mmap 载入，首次更新时才展开到内存
+import os
+import json
+import mmap
+import threading
+from array import array
+from collections import Counter
+
+class SearchIndex:
+    def __init__(self, root):
+        self.root = root
+        self.words, self.word_ids = [], {}    # word id <-> word
+        self.books, self.book_ids = [], {}    # book id <-> {"file", "sha256"} (删除后留空位 None)
+        self._post = self._fwd = None         # 展开后的 array('I') 列表；None 表示仍在使用 mmap
+        self._mm = None
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- 持久化 ---
+    def _paths(self):
+        return os.path.join(self.root, "meta.json"), os.path.join(self.root, "index.bin")
+
+    def _load(self):
+        meta_path, bin_path = self._paths()
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f: meta = json.load(f)
+            with open(bin_path, "rb") as f: self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self._post, self._fwd = [], []
+            return
+        self.words, self.books = meta["words"], meta["books"]
+        self.word_ids = {w: i for i, w in enumerate(self.words)}
+        self.book_ids = {b["file"]: i for i, b in enumerate(self.books) if b}
+        # index.bin 布局: [posting 偏移 W+1][正排偏移 B+1][posting 数据][正排数据]，均为 uint32
+        data = memoryview(self._mm).cast("I")
+        w, b = len(self.words), len(self.books)
+        self._post_off, self._fwd_off = data[:w + 1], data[w + 1:w + b + 2]
+        self._post_data = data[w + b + 2:w + b + 2 + self._post_off[w]]
+        self._fwd_data = data[w + b + 2 + self._post_off[w]:]
+
+    def save(self):
+        with self._lock:
+            self._materialize()
+            os.makedirs(self.root, exist_ok=True)
+            meta_path, bin_path = self._paths()
+            offsets = array("I", [0])
+            for p in self._post: offsets.append(offsets[-1] + len(p))
+            fwd_offsets = array("I", [0])
+            for p in self._fwd: fwd_offsets.append(fwd_offsets[-1] + len(p))
+            with open(bin_path + ".tmp", "wb") as f:
+                offsets.tofile(f); fwd_offsets.tofile(f)
+                for p in self._post: p.tofile(f)
+                for p in self._fwd: p.tofile(f)
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"words": self.words, "books": self.books}, f, ensure_ascii=False)
+            os.replace(bin_path + ".tmp", bin_path)
+            os.replace(meta_path + ".tmp", meta_path)
+
+    def _postings(self, wid):
+        if self._post is not None: return self._post[wid]
+        return self._post_data[self._post_off[wid]:self._post_off[wid + 1]]
+
+    def _forward(self, bid):
+        if self._fwd is not None: return self._fwd[bid]
+        return self._fwd_data[self._fwd_off[bid]:self._fwd_off[bid + 1]]
+
+    def _materialize(self):
+        """从 mmap 只读视图展开为可修改的 array"""
+        if self._post is not None: return
+        self._post = [array("I", self._postings(i)) for i in range(len(self.words))]
+        self._fwd = [array("I", self._forward(i)) for i in range(len(self.books))]
+        del self._post_off, self._fwd_off, self._post_data, self._fwd_data
+        self._mm.close()
+        self._mm = None
+
+    # --- 增量更新 ---
+    def add_book(self, filename, sha256, words):
+        with self._lock:
+            self._materialize()
+            if filename in self.book_ids: self._remove(self.book_ids[filename])
+            bid = len(self.books)
+            self.books.append({"file": filename, "sha256": sha256})
+            self.book_ids[filename] = bid
+            wids = sorted({self._word_id(w) for w in words})
+            self._fwd.append(array("I", wids))
+            # 新书 ID 最大，直接追加即可保持 posting list 有序
+            for wid in wids: self._post[wid].append(bid)
+
+    def remove_book(self, filename):
+        with self._lock:
+            self._materialize()
+            if filename in self.book_ids: self._remove(self.book_ids[filename])
+
+    def _remove(self, bid):
+        for wid in self._fwd[bid]: self._post[wid].remove(bid)
+        del self.book_ids[self.books[bid]["file"]]
+        self.books[bid], self._fwd[bid] = None, array("I")
+
+    def _word_id(self, word):
+        wid = self.word_ids.get(word)
+        if wid is None:
+            wid = self.word_ids[word] = len(self.words)
+            self.words.append(word)
+            self._post.append(array("I"))
+        return wid
+
+    def sync(self, catalog):
+        """与词书库目录对齐：只重新索引新增/内容变化的书，删除已不存在的书"""
+        entries = {b["file"]: b for b in catalog.entries()}
+        changed = False
+        for f, b in entries.items():
+            bid = self.book_ids.get(f)
+            if bid is not None and self.books[bid]["sha256"] == b["sha256"]: continue
+            try: words = {w.strip().lower() for w in catalog.read(f).splitlines() if w.strip()}
+            except (OSError, KeyError, UnicodeDecodeError): continue
+            self.add_book(f, b["sha256"], words)
+            changed = True
+        for f in set(self.book_ids) - set(entries):
+            self.remove_book(f)
+            changed = True
+        if changed: self.save()
+
+    # --- 查询 ---
+    def books_with(self, word):
+        """哪些书包含这个词"""
+        with self._lock:
+            wid = self.word_ids.get(word.strip().lower())
+            return [] if wid is None else [self.books[b]["file"] for b in self._postings(wid)]
+
+    def rank(self, words, limit=10):
+        """按与给定词集 (上传文本 / 熟词表) 的重合度给书排序：
+        overlap = 重合词数，coverage = 书中已被覆盖的比例 (越高越容易)"""
+        counts = Counter()
+        with self._lock:
+            for w in set(words):
+                wid = self.word_ids.get(w)
+                if wid is not None: counts.update(self._postings(wid))
+            ranked = []
+            for bid, n in counts.items():
+                size = len(self._forward(bid))
+                ranked.append({"file": self.books[bid]["file"], "overlap": n, "words": size, "coverage": n / size})
+        ranked.sort(key=lambda r: (-r["coverage"], -r["overlap"]))
+        return ranked[:limit]
+
+    def common_words(self, file_a, file_b):
+        with self._lock:
+            a, b = self._forward(self.book_ids[file_a]), self._forward(self.book_ids[file_b])
+            return [self.words[i] for i in sorted(set(a).intersection(b))]
+
+    def unique_words(self, file_a, file_b):
+        """file_a 中有而 file_b 中没有的词"""
+        with self._lock:
+            a, b = self._forward(self.book_ids[file_a]), self._forward(self.book_ids[file_b])
+            return [self.words[i] for i in sorted(set(a).difference(b))]
@@ -0,0 +1,63 @@
+# 熟词表：规范化、常驻内存的预置词表索引，以及多个词表的零拷贝并集
+import os
+import functools
+import threading
+from vocabmaster.engine import nltk_lemma
+
+class Wordlist(frozenset):
+    """规范化后的熟词表"""
+
+def normalize_wordlist(data):
+    """去空白、转小写，并同时收录每个词的词形还原结果，保证能屏蔽到 lemma"""
+    words = set()
+    for line in data.decode("utf-8", errors="ignore").splitlines():
+        w = line.strip().lower()
+        if not w: continue
+        words.add(w)
+        if w.isascii() and w.isalpha(): words.add(nltk_lemma(w))
+    return Wordlist(words)
+
+@functools.lru_cache(maxsize=32)
+def load_custom_wordlist(data):
+    return normalize_wordlist(data)
+
+class FilterSet:
+    """多个熟词表的并集视图：逐个查询成员集合，不复制数据"""
+    __slots__ = ("parts",)
+    def __init__(self, parts):
+        self.parts = [p for p in parts if p]
+
+    def __contains__(self, word):
+        for p in self.parts:
+            if word in p: return True
+        return False
+
+    def __bool__(self):
+        return bool(self.parts)
+
+    def __iter__(self):
+        # 去重后的全部词：batch_extract 需要把它物化成 frozenset 发给子进程
+        seen = set()
+        for p in self.parts:
+            for w in p:
+                if w not in seen: seen.add(w); yield w
+
+class WordlistIndex:
+    """预置词表的常驻内存索引：每个文件只加载一次，修改时间变化后自动重载"""
+    def __init__(self, paths=()):
+        self._entries = {}
+        self._lock = threading.Lock()
+        for p in paths: self.get(p)
+
+    def get(self, path):
+        try: mtime = os.stat(path).st_mtime_ns
+        except OSError: return Wordlist()
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != mtime:
+            with self._lock:
+                with open(path, "rb") as f: entry = (mtime, normalize_wordlist(f.read()))
+                self._entries[path] = entry
+        return entry[1]
+
+    def union(self, paths, extra=()):
+        return FilterSet([self.get(p) for p in paths] + list(extra))